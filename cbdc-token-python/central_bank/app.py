@@ -5,14 +5,17 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, jsonify, request
+import orjson
+from flask import Flask, Response, abort, jsonify, request
 from flask_cors import CORS
 from database import (
     mint_tokens, mint_mixed_tokens, mint_specific_denominations,
     register_fi, allocate_tokens_to_fi,
-    get_fi_tokens, get_money_supply, get_ledger, get_all_fis,
-    transfer_tokens_between_fis, validate_wallet
+    get_fi_tokens, get_fi_token_summary, get_money_supply, iter_ledger, get_all_fis,
+    get_token_history,
+    transfer_tokens_between_fis, validate_wallet, release_db
 )
+from shared.http_utils import json_response, row_default
 from shared.token_utils import DENOMINATIONS
 
 app = Flask(__name__)
@@ -20,10 +23,30 @@ CORS(app)
 
 PORT = int(os.environ.get('PORT', 4000))
 
+# Responses that only depend on constants, serialized once at import
+HEALTH_BYTES = orjson.dumps({'status': 'ok', 'service': 'Central Bank', 'type': 'token-based'})
+DENOMINATIONS_BYTES = orjson.dumps({'denominations': DENOMINATIONS})
+
+
+def _params(*required):
+    """Parse the JSON body once; returns (data, names of missing/empty required fields)
+    A body that isn't a JSON object is answered with a 400."""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        abort(json_response({'error': 'JSON body must be an object'}, 400))
+    missing = [k for k in required if not data.get(k)]
+    return data, missing
+
+
+@app.teardown_appcontext
+def release_connection(exc):
+    """Hand the request's connection back to the pool (a half-finished write is rolled back)"""
+    release_db()
+
 
 @app.route('/api/health')
 def health():
-    return jsonify({'status': 'ok', 'service': 'Central Bank', 'type': 'token-based'})
+    return Response(HEALTH_BYTES, mimetype='application/json')
 
 
 # ========== TOKEN MINTING ==========
@@ -31,14 +54,14 @@ def health():
 @app.route('/api/token/mint', methods=['POST'])
 def api_mint_tokens():
     """Mint new tokens of a specific denomination"""
-    data = request.json
-    denomination = data.get('denomination')
+    data, missing = _params('denomination')
+    if missing:
+        return jsonify({'error': 'denomination is required'}), 400
+    
+    denomination = data['denomination']
     count = data.get('count', 1)
     purpose = data.get('purpose', 'General circulation')
     
-    if not denomination:
-        return jsonify({'error': 'denomination is required'}), 400
-    
     result = mint_tokens(denomination, count, purpose)
     if 'error' in result:
         return jsonify(result), 400
@@ -48,13 +71,13 @@ def api_mint_tokens():
 @app.route('/api/token/mint/mixed', methods=['POST'])
 def api_mint_mixed():
     """Mint tokens to match a specific amount"""
-    data = request.json
-    amount = data.get('amount')
-    purpose = data.get('purpose', 'Mixed minting')
-    
-    if not amount:
+    data, missing = _params('amount')
+    if missing:
         return jsonify({'error': 'amount is required'}), 400
     
+    amount = data['amount']
+    purpose = data.get('purpose', 'Mixed minting')
+    
     result = mint_mixed_tokens(amount, purpose)
     if 'error' in result:
         return jsonify(result), 400
@@ -67,13 +90,13 @@ def api_mint_specific():
     Mint specific number of tokens for each denomination
     Body: { "denominations": {"2000": 5, "500": 10, "100": 20}, "purpose": "..." }
     """
-    data = request.json
-    denominations = data.get('denominations', {})
-    purpose = data.get('purpose', 'Specific denomination minting')
-    
-    if not denominations:
+    data, missing = _params('denominations')
+    if missing:
         return jsonify({'error': 'denominations object is required. Example: {"2000": 5, "500": 10}'}), 400
     
+    denominations = data['denominations']
+    purpose = data.get('purpose', 'Specific denomination minting')
+    
     # Convert string keys to integers
     denom_counts = {}
     for denom, count in denominations.items():
@@ -91,7 +114,7 @@ def api_mint_specific():
 @app.route('/api/token/denominations')
 def api_denominations():
     """Get available denominations"""
-    return jsonify({'denominations': DENOMINATIONS})
+    return Response(DENOMINATIONS_BYTES, mimetype='application/json')
 
 
 # ========== FI MANAGEMENT ==========
@@ -99,15 +122,11 @@ def api_denominations():
 @app.route('/api/fi/register', methods=['POST'])
 def api_register_fi():
     """Register a new Financial Institution"""
-    data = request.json
-    fi_id = data.get('fi_id')
-    name = data.get('name')
-    api_url = data.get('api_url')
-    
-    if not all([fi_id, name, api_url]):
+    data, missing = _params('fi_id', 'name', 'api_url')
+    if missing:
         return jsonify({'error': 'fi_id, name, and api_url are required'}), 400
     
-    result = register_fi(fi_id, name, api_url)
+    result = register_fi(data['fi_id'], data['name'], data['api_url'])
     if 'error' in result:
         return jsonify(result), 400
     return jsonify(result)
@@ -117,16 +136,16 @@ def api_register_fi():
 def api_list_fis():
     """List all registered FIs"""
     fis = get_all_fis()
-    return jsonify({'fis': fis})
+    return json_response({'fis': fis})
 
 
 @app.route('/api/fi/<fi_id>/allocate', methods=['POST'])
 def api_allocate_to_fi(fi_id):
     """Allocate tokens to an FI"""
-    data = request.json
+    data, missing = _params('amount')
     amount = data.get('amount')
     
-    if not amount or amount <= 0:
+    if missing or amount <= 0:
         return jsonify({'error': 'Valid amount is required'}), 400
     
     result = allocate_tokens_to_fi(fi_id, amount)
@@ -137,37 +156,28 @@ def api_allocate_to_fi(fi_id):
 
 @app.route('/api/fi/<fi_id>/tokens')
 def api_fi_tokens(fi_id):
-    """Get tokens owned by an FI"""
-    tokens = get_fi_tokens(fi_id)
-    total = sum(t['denomination'] for t in tokens)
+    """
+    Get an FI's token holdings
+    Token list is only included when paginated: ?limit=100&offset=0
+    """
+    result = get_fi_token_summary(fi_id)
     
-    # Group by denomination
-    by_denom = {}
-    for t in tokens:
-        d = t['denomination']
-        by_denom[d] = by_denom.get(d, 0) + 1
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        offset = request.args.get('offset', 0, type=int)
+        result['tokens'] = get_fi_tokens(fi_id, limit, offset)
     
-    return jsonify({
-        'fi_id': fi_id,
-        'total_balance': total,
-        'token_count': len(tokens),
-        'breakdown': by_denom,
-        'tokens': tokens
-    })
+    return json_response(result)
 
 
 @app.route('/api/fi/transfer', methods=['POST'])
 def api_transfer_between_fis():
     """Transfer tokens between FIs"""
-    data = request.json
-    from_fi = data.get('from_fi')
-    to_fi = data.get('to_fi')
-    token_serials = data.get('token_serials', [])
-    
-    if not all([from_fi, to_fi, token_serials]):
+    data, missing = _params('from_fi', 'to_fi', 'token_serials')
+    if missing:
         return jsonify({'error': 'from_fi, to_fi, and token_serials are required'}), 400
     
-    result = transfer_tokens_between_fis(from_fi, to_fi, token_serials)
+    result = transfer_tokens_between_fis(data['from_fi'], data['to_fi'], data['token_serials'])
     if 'error' in result:
         return jsonify(result), 400
     return jsonify(result)
@@ -178,15 +188,32 @@ def api_transfer_between_fis():
 @app.route('/api/money-supply')
 def api_money_supply():
     """Get money supply statistics"""
-    return jsonify(get_money_supply())
+    return json_response(get_money_supply())
 
 
 @app.route('/api/ledger')
 def api_ledger():
-    """Get ledger entries"""
+    """Get ledger entries (streamed row by row)"""
     limit = request.args.get('limit', 100, type=int)
-    entries = get_ledger(limit)
-    return jsonify({'ledger': entries, 'count': len(entries)})
+    
+    def generate():
+        yield b'{"ledger":['
+        count = 0
+        for entry in iter_ledger(limit):
+            if count:
+                yield b','
+            yield orjson.dumps(entry, default=row_default)
+            count += 1
+        yield b'],"count":%d}' % count
+    
+    return Response(generate(), mimetype='application/json')
+
+
+@app.route('/api/token/<serial>/history')
+def api_token_history(serial):
+    """Get ledger entries that moved a token"""
+    entries = get_token_history(serial)
+    return json_response({'serial_number': serial, 'history': entries, 'count': len(entries)})
 
 
 # ========== WALLET VALIDATION ==========
@@ -201,4 +228,6 @@ def api_validate_wallet(wallet_id):
 if __name__ == '__main__':
     print(f"🏛️ Central Bank (Token-Based) starting on port {PORT}")
     print(f"📜 Valid denominations: {DENOMINATIONS}")
-    app.run(host='0.0.0.0', port=PORT, debug=True)
+    # Development server only; production runs under gunicorn (see gunicorn_conf.py)
+    debug = os.environ.get('FLASK_ENV') == 'development'
+    app.run(host='0.0.0.0', port=PORT, debug=debug, threaded=True)
@@ -6,28 +6,137 @@ import sqlite3
 import os
 import time
 import secrets
-from typing import Dict, List, Optional, Tuple
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from shared.token_utils import generate_serial_number, DENOMINATIONS, make_change
+from shared.db import CONNECTION_PRAGMAS, ConnectionPool
+from shared.token_utils import generate_serial_numbers, DENOMINATIONS, make_change_counts, make_change_from
 from shared.zkp import generate_keypair
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 DB_PATH = os.path.join(DATA_DIR, 'central_bank.db')
 
+# Max serials bound into one IN (...) query (SQLite's default variable limit is 999)
+IN_CHUNK_SIZE = 500
+
+# Hot-path statements, kept as module constants so each connection's
+# statement cache reuses the compiled plan instead of re-preparing them
+_INSERT_TOKEN_SQL = '''
+    INSERT INTO tokens (serial_number, denomination, status, current_owner, owner_type, minted_at, batch_id)
+    VALUES (?, ?, 'active', 'CB', 'cb', ?, ?)
+'''
+
+_INSERT_BATCH_SQL = '''
+    INSERT INTO token_batches (batch_id, denomination, count, minted_at, purpose)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+_INSERT_LEDGER_SQL = '''
+    INSERT INTO ledger (id, transaction_type, from_entity, to_entity, token_serials, total_amount, description, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_INSERT_LEDGER_SERIAL_SQL = '''
+    INSERT OR IGNORE INTO ledger_serials (ledger_id, serial) VALUES (?, ?)
+'''
+
+# Ledger columns as the API returns them: the stored token_serials column only
+# holds the count (the serials live in ledger_serials), so it is exposed as token_count
+_LEDGER_COLUMNS = '''
+    l.id, l.transaction_type, l.from_entity, l.to_entity,
+    CAST(l.token_serials AS INTEGER) AS token_count,
+    l.total_amount, l.description, l.zkp_proof, l.timestamp
+'''
+
+_VAULT_COUNTS_SQL = '''
+    SELECT denomination, COUNT(*) as count FROM tokens 
+    WHERE current_owner = 'CB' AND status = 'active'
+    GROUP BY denomination
+'''
+
+_SELECT_VAULT_TOKENS_SQL = '''
+    SELECT serial_number, denomination FROM tokens 
+    WHERE current_owner = 'CB' AND status = 'active' AND denomination = ?
+    LIMIT ?
+'''
+
+_ALLOCATE_TOKEN_SQL = '''
+    UPDATE tokens SET current_owner = ?, owner_type = 'fi', last_transfer_at = ?
+    WHERE serial_number = ?
+'''
+
+_TRANSFER_TOKEN_SQL = '''
+    UPDATE tokens SET current_owner = ?, last_transfer_at = ?
+    WHERE serial_number = ?
+'''
+
+# Bump when init_db() gains new tables/indexes so existing databases get them
+SCHEMA_VERSION = 2
+
+# Serializes writers so concurrent requests don't race for SQLite's write lock
+_write_lock = threading.RLock()
+
+
+def _ensure_schema(conn: sqlite3.Connection):
+    """Create or upgrade the schema, tracked by a version row in meta (run once per process)"""
+    conn.execute('CREATE TABLE IF NOT EXISTS meta (schema_version INTEGER PRIMARY KEY)')
+    current = conn.execute('SELECT MAX(schema_version) FROM meta').fetchone()[0] or 0
+    
+    if current < SCHEMA_VERSION:
+        init_db(conn)
+        conn.execute('INSERT OR REPLACE INTO meta (schema_version) VALUES (?)', (SCHEMA_VERSION,))
+
+
+# Autocommit mode: _txn() issues its own BEGIN IMMEDIATE, so reads inside a
+# write transaction are covered by the database lock too
+_pool = ConnectionPool(lambda: DB_PATH, _ensure_schema,
+                       pragmas=CONNECTION_PRAGMAS + ('PRAGMA mmap_size=268435456',),  # 256 MB
+                       cached_statements=256, isolation_level=None)
+
+
 def get_db():
-    """Get database connection"""
-    os.makedirs(DATA_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get this request's database connection from the pool"""
+    return _pool.get()
 
 
-def init_db():
-    """Initialize database schema"""
-    conn = get_db()
+def release_db():
+    """Return this request's connection to the pool, discarding uncommitted work"""
+    _pool.release()
+
+
+def record_ledger_serials(cursor, ledger_id: str, serials: List[str]):
+    """Attach the serials moved by a ledger entry"""
+    cursor.executemany(_INSERT_LEDGER_SERIAL_SQL, [(ledger_id, serial) for serial in serials])
+
+
+@contextmanager
+def _txn():
+    """
+    Run one write transaction under the write lock
+    BEGIN IMMEDIATE takes SQLite's write lock up front, so the block's reads
+    and writes are atomic across gunicorn worker processes, not just threads.
+    Commits once when the block finishes, rolls back if it raises
+    """
+    with _write_lock:
+        conn = get_db()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn.cursor()
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+
+def init_db(conn: sqlite3.Connection):
+    """Initialize database schema (called by _ensure_schema; every statement is idempotent)"""
     cursor = conn.cursor()
     
+    # Write-ahead logging lets readers run concurrently with a writer
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
     # Tokens table - each row is a single token (like a banknote)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS tokens (
@@ -63,7 +172,7 @@ def init_db():
             transaction_type TEXT NOT NULL,
             from_entity TEXT,
             to_entity TEXT,
-            token_serials TEXT NOT NULL,
+            token_serials TEXT NOT NULL,   -- token count; serials are in ledger_serials
             total_amount INTEGER NOT NULL,
             description TEXT,
             zkp_proof TEXT,
@@ -71,6 +180,18 @@ def init_db():
         )
     ''')
     
+    # Tokens moved by each ledger entry (one row per serial)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ledger_serials (
+            ledger_id TEXT NOT NULL,
+            serial TEXT NOT NULL,
+            PRIMARY KEY (ledger_id, serial)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ledger_serials_serial ON ledger_serials (serial)
+    ''')
+    
     # Spent nullifiers (for double-spending prevention)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS nullifiers (
@@ -92,8 +213,22 @@ def init_db():
         )
     ''')
     
-    conn.commit()
-    conn.close()
+    # Indexes for the hot owner/status filters and money-supply grouping.
+    # Owner lookups also cover denomination so vault selection is an index range scan
+    cursor.execute('DROP INDEX IF EXISTS idx_tokens_owner_status')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tokens_owner_status_denom
+        ON tokens (current_owner, status, denomination)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tokens_ownertype_status
+        ON tokens (owner_type, status)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tokens_status_denom
+        ON tokens (status, denomination)
+    ''')
+    
     print("✅ Central Bank database initialized")
 
 
@@ -108,40 +243,33 @@ def mint_tokens(denomination: int, count: int, purpose: str = "General circulati
     if count <= 0 or count > 10000:
         return {'error': 'Count must be between 1 and 10000'}
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    batch_id = f"BATCH-{secrets.token_hex(4).upper()}"
-    timestamp = int(time.time() * 1000)
-    
-    tokens = []
-    for i in range(count):
-        serial = generate_serial_number("RBI", denomination, batch_id)
-        tokens.append({
-            'serial_number': serial,
-            'denomination': denomination
-        })
+    with _txn() as cursor:
+        batch_id = f"BATCH-{secrets.token_hex(4).upper()}"
+        timestamp = int(time.time() * 1000)
         
-        cursor.execute('''
-            INSERT INTO tokens (serial_number, denomination, status, current_owner, owner_type, minted_at, batch_id)
-            VALUES (?, ?, 'active', 'CB', 'cb', ?, ?)
-        ''', (serial, denomination, timestamp, batch_id))
-    
-    # Record batch
-    cursor.execute('''
-        INSERT INTO token_batches (batch_id, denomination, count, minted_at, purpose)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (batch_id, denomination, count, timestamp, purpose))
-    
-    # Record in ledger
-    tx_id = f"mint-{secrets.token_hex(8)}"
-    cursor.execute('''
-        INSERT INTO ledger (id, transaction_type, from_entity, to_entity, token_serials, total_amount, description, timestamp)
-        VALUES (?, 'mint', 'CENTRAL_BANK', 'CB_VAULT', ?, ?, ?, ?)
-    ''', (tx_id, str([t['serial_number'] for t in tokens]), denomination * count, f"Minted {count}x ₹{denomination}", timestamp))
-    
-    conn.commit()
-    conn.close()
+        serials = generate_serial_numbers(denomination, count)
+        tokens = []
+        rows = []
+        for serial in serials:
+            tokens.append({
+                'serial_number': serial,
+                'denomination': denomination
+            })
+            rows.append((serial, denomination, timestamp, batch_id))
+        
+        # Insert all tokens in one statement batch (single transaction)
+        cursor.executemany(_INSERT_TOKEN_SQL, rows)
+        
+        # Record batch
+        cursor.execute(_INSERT_BATCH_SQL, (batch_id, denomination, count, timestamp, purpose))
+        
+        # Record in ledger
+        tx_id = f"mint-{secrets.token_hex(8)}"
+        cursor.execute(_INSERT_LEDGER_SQL, (
+            tx_id, 'mint', 'CENTRAL_BANK', 'CB_VAULT', count, denomination * count,
+            f"Minted {count}x ₹{denomination}", timestamp
+        ))
+        record_ledger_serials(cursor, tx_id, serials)
     
     return {
         'success': True,
@@ -167,52 +295,49 @@ def mint_specific_denominations(denomination_counts: Dict[int, int], purpose: st
         if denomination_counts[denom] > 10000:
             return {'error': f'Count for ₹{denom} cannot exceed 10000'}
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    batch_id = f"BATCH-{secrets.token_hex(4).upper()}"
-    timestamp = int(time.time() * 1000)
-    
-    all_tokens = []
-    breakdown = {}
-    total_value = 0
-    
-    for denom, count in denomination_counts.items():
-        if count <= 0:
-            continue
-            
-        breakdown[denom] = count
-        denom_value = denom * count
-        total_value += denom_value
+    with _txn() as cursor:
+        batch_id = f"BATCH-{secrets.token_hex(4).upper()}"
+        timestamp = int(time.time() * 1000)
         
-        for i in range(count):
-            serial = generate_serial_number("RBI", denom, batch_id)
-            all_tokens.append({
-                'serial_number': serial,
-                'denomination': denom
-            })
+        serials = []
+        all_tokens = []
+        rows = []
+        batch_rows = []
+        breakdown = {}
+        total_value = 0
+        
+        for denom, count in denomination_counts.items():
+            if count <= 0:
+                continue
+                
+            breakdown[denom] = count
+            denom_value = denom * count
+            total_value += denom_value
+            
+            denom_serials = generate_serial_numbers(denom, count)
+            serials.extend(denom_serials)
+            for serial in denom_serials:
+                all_tokens.append({
+                    'serial_number': serial,
+                    'denomination': denom
+                })
+                rows.append((serial, denom, timestamp, batch_id))
             
-            cursor.execute('''
-                INSERT INTO tokens (serial_number, denomination, status, current_owner, owner_type, minted_at, batch_id)
-                VALUES (?, ?, 'active', 'CB', 'cb', ?, ?)
-            ''', (serial, denom, timestamp, batch_id))
+            # Record batch per denomination
+            batch_rows.append((f"{batch_id}-{denom}", denom, count, timestamp, purpose))
         
-        # Record batch per denomination
-        cursor.execute('''
-            INSERT INTO token_batches (batch_id, denomination, count, minted_at, purpose)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (f"{batch_id}-{denom}", denom, count, timestamp, purpose))
-    
-    # Record in ledger
-    tx_id = f"mint-{secrets.token_hex(8)}"
-    description = "Minted: " + ", ".join([f"{c}x₹{d}" for d, c in breakdown.items()])
-    cursor.execute('''
-        INSERT INTO ledger (id, transaction_type, from_entity, to_entity, token_serials, total_amount, description, timestamp)
-        VALUES (?, 'mint', 'CENTRAL_BANK', 'CB_VAULT', ?, ?, ?, ?)
-    ''', (tx_id, str([t['serial_number'] for t in all_tokens]), total_value, description, timestamp))
-    
-    conn.commit()
-    conn.close()
+        # Insert tokens for all denominations in one statement batch
+        cursor.executemany(_INSERT_TOKEN_SQL, rows)
+        
+        cursor.executemany(_INSERT_BATCH_SQL, batch_rows)
+        
+        # Record in ledger
+        tx_id = f"mint-{secrets.token_hex(8)}"
+        description = "Minted: " + ", ".join([f"{c}x₹{d}" for d, c in breakdown.items()])
+        cursor.execute(_INSERT_LEDGER_SQL, (
+            tx_id, 'mint', 'CENTRAL_BANK', 'CB_VAULT', len(all_tokens), total_value, description, timestamp
+        ))
+        record_ledger_serials(cursor, tx_id, serials)
     
     return {
         'success': True,
@@ -232,51 +357,44 @@ def mint_mixed_tokens(amount: int, purpose: str = "FI allocation") -> Dict:
         return {'error': 'Amount must be positive'}
     
     # Calculate optimal denomination breakdown
-    denominations_needed = make_change(amount)
+    by_denom = make_change_counts(amount)
     
-    if sum(denominations_needed) != amount:
+    if sum(d * c for d, c in by_denom.items()) != amount:
         return {'error': f'Cannot create exact amount {amount} with available denominations'}
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
+    with _txn() as cursor:
+        return _mint_mixed(cursor, by_denom, amount, purpose)
+
+
+def _mint_mixed(cursor, by_denom: Dict[int, int], amount: int, purpose: str) -> Dict:
+    """Insert a mixed-denomination mint into the caller's transaction"""
     batch_id = f"BATCH-{secrets.token_hex(4).upper()}"
     timestamp = int(time.time() * 1000)
     
+    serials = []
     tokens = []
-    for denom in denominations_needed:
-        serial = generate_serial_number("RBI", denom, batch_id)
-        tokens.append({
-            'serial_number': serial,
-            'denomination': denom
-        })
-        
-        cursor.execute('''
-            INSERT INTO tokens (serial_number, denomination, status, current_owner, owner_type, minted_at, batch_id)
-            VALUES (?, ?, 'active', 'CB', 'cb', ?, ?)
-        ''', (serial, denom, timestamp, batch_id))
+    rows = []
+    for denom, count in by_denom.items():
+        denom_serials = generate_serial_numbers(denom, count)
+        serials.extend(denom_serials)
+        for serial in denom_serials:
+            tokens.append({
+                'serial_number': serial,
+                'denomination': denom
+            })
+            rows.append((serial, denom, timestamp, batch_id))
+    
+    cursor.executemany(_INSERT_TOKEN_SQL, rows)
     
     # Record batch
-    cursor.execute('''
-        INSERT INTO token_batches (batch_id, denomination, count, minted_at, purpose)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (batch_id, 0, len(tokens), timestamp, f"Mixed: {purpose}"))
+    cursor.execute(_INSERT_BATCH_SQL, (batch_id, 0, len(tokens), timestamp, f"Mixed: {purpose}"))
     
     # Record in ledger
     tx_id = f"mint-{secrets.token_hex(8)}"
-    cursor.execute('''
-        INSERT INTO ledger (id, transaction_type, from_entity, to_entity, token_serials, total_amount, description, timestamp)
-        VALUES (?, 'mint', 'CENTRAL_BANK', 'CB_VAULT', ?, ?, ?, ?)
-    ''', (tx_id, str([t['serial_number'] for t in tokens]), amount, purpose, timestamp))
-    
-    conn.commit()
-    conn.close()
-    
-    # Group by denomination for display
-    by_denom = {}
-    for t in tokens:
-        d = t['denomination']
-        by_denom[d] = by_denom.get(d, 0) + 1
+    cursor.execute(_INSERT_LEDGER_SQL, (
+        tx_id, 'mint', 'CENTRAL_BANK', 'CB_VAULT', len(tokens), amount, purpose, timestamp
+    ))
+    record_ledger_serials(cursor, tx_id, serials)
     
     return {
         'success': True,
@@ -290,25 +408,19 @@ def mint_mixed_tokens(amount: int, purpose: str = "FI allocation") -> Dict:
 
 def register_fi(fi_id: str, name: str, api_url: str) -> Dict:
     """Register a new Financial Institution"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Check if already exists
-    cursor.execute('SELECT fi_id FROM financial_institutions WHERE fi_id = ?', (fi_id,))
-    if cursor.fetchone():
-        conn.close()
-        return {'error': 'FI already registered', 'fi_id': fi_id}
-    
-    keypair = generate_keypair()
-    timestamp = int(time.time() * 1000)
-    
-    cursor.execute('''
-        INSERT INTO financial_institutions (fi_id, name, api_url, public_key, registered_at)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (fi_id, name, api_url, keypair['public_key'], timestamp))
-    
-    conn.commit()
-    conn.close()
+    with _txn() as cursor:
+        # Check if already exists
+        cursor.execute('SELECT fi_id FROM financial_institutions WHERE fi_id = ?', (fi_id,))
+        if cursor.fetchone():
+            return {'error': 'FI already registered', 'fi_id': fi_id}
+        
+        keypair = generate_keypair()
+        timestamp = int(time.time() * 1000)
+        
+        cursor.execute('''
+            INSERT INTO financial_institutions (fi_id, name, api_url, public_key, registered_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (fi_id, name, api_url, keypair['public_key'], timestamp))
     
     return {
         'success': True,
@@ -320,81 +432,44 @@ def register_fi(fi_id: str, name: str, api_url: str) -> Dict:
 
 def allocate_tokens_to_fi(fi_id: str, amount: int) -> Dict:
     """Allocate tokens from CB vault to an FI"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Verify FI exists
-    cursor.execute('SELECT * FROM financial_institutions WHERE fi_id = ?', (fi_id,))
-    fi = cursor.fetchone()
-    if not fi:
-        conn.close()
-        return {'error': 'FI not found'}
-    
-    # Get available tokens from CB vault
-    cursor.execute('''
-        SELECT serial_number, denomination FROM tokens 
-        WHERE current_owner = 'CB' AND status = 'active'
-        ORDER BY denomination DESC
-    ''')
-    available = [dict(r) for r in cursor.fetchall()]
-    
-    # Select tokens to transfer
-    selected = []
-    total = 0
-    for token in available:
-        if total >= amount:
-            break
-        selected.append(token)
-        total += token['denomination']
-    
-    if total < amount:
-        # Need to mint more tokens
-        conn.close()
-        mint_result = mint_mixed_tokens(amount - total, f"Additional for {fi_id}")
-        if 'error' in mint_result:
-            return mint_result
+    with _txn() as cursor:
+        # Verify FI exists
+        cursor.execute('SELECT * FROM financial_institutions WHERE fi_id = ?', (fi_id,))
+        fi = cursor.fetchone()
+        if not fi:
+            return {'error': 'FI not found'}
+        
+        # Count what the CB vault holds per denomination
+        cursor.execute(_VAULT_COUNTS_SQL)
+        available = {r['denomination']: r['count'] for r in cursor.fetchall()}
+        
+        # Pick an exact combination from the vault; whatever it can't cover gets minted
+        counts, shortfall = make_change_from(amount, available)
         
-        # Retry with new tokens
-        return allocate_tokens_to_fi(fi_id, amount)
-    
-    # Calculate change if overpaid
-    if total > amount:
-        # For simplicity, only transfer exact tokens
-        # In real system, would break tokens
         selected = []
-        total = 0
-        for token in sorted(available, key=lambda t: t['denomination']):
-            if total + token['denomination'] <= amount:
-                selected.append(token)
-                total += token['denomination']
+        for denom, needed in counts.items():
+            cursor.execute(_SELECT_VAULT_TOKENS_SQL, (denom, needed))
+            selected.extend(dict(r) for r in cursor.fetchall())
         
-        if total < amount:
-            # Mint exact amount needed
-            conn.close()
-            mint_result = mint_mixed_tokens(amount, f"Allocation for {fi_id}")
-            if 'error' in mint_result:
-                return mint_result
-            selected = mint_result['tokens']
-            total = amount
-    
-    timestamp = int(time.time() * 1000)
-    
-    # Transfer ownership
-    for token in selected:
-        cursor.execute('''
-            UPDATE tokens SET current_owner = ?, owner_type = 'fi', last_transfer_at = ?
-            WHERE serial_number = ?
-        ''', (fi_id, timestamp, token['serial_number']))
-    
-    # Record in ledger
-    tx_id = f"alloc-{secrets.token_hex(8)}"
-    cursor.execute('''
-        INSERT INTO ledger (id, transaction_type, from_entity, to_entity, token_serials, total_amount, description, timestamp)
-        VALUES (?, 'allocation', 'CB', ?, ?, ?, ?, ?)
-    ''', (tx_id, fi_id, str([t['serial_number'] for t in selected]), total, f"Allocation to {fi['name']}", timestamp))
-    
-    conn.commit()
-    conn.close()
+        # Mint the shortfall in this same transaction
+        if shortfall > 0:
+            mint_result = _mint_mixed(cursor, make_change_counts(shortfall), shortfall,
+                                      f"Additional for {fi_id}")
+            selected.extend(mint_result['tokens'])
+        
+        total = amount
+        
+        timestamp = int(time.time() * 1000)
+        
+        # Transfer ownership
+        cursor.executemany(_ALLOCATE_TOKEN_SQL, [(fi_id, timestamp, t['serial_number']) for t in selected])
+        
+        # Record in ledger
+        tx_id = f"alloc-{secrets.token_hex(8)}"
+        cursor.execute(_INSERT_LEDGER_SQL, (
+            tx_id, 'allocation', 'CB', fi_id, len(selected), total, f"Allocation to {fi['name']}", timestamp
+        ))
+        record_ledger_serials(cursor, tx_id, [t['serial_number'] for t in selected])
     
     # Group by denomination
     by_denom = {}
@@ -413,8 +488,8 @@ def allocate_tokens_to_fi(fi_id: str, amount: int) -> Dict:
     }
 
 
-def get_fi_tokens(fi_id: str) -> List[Dict]:
-    """Get all tokens owned by an FI"""
+def get_fi_tokens(fi_id: str, limit: int = -1, offset: int = 0) -> List[sqlite3.Row]:
+    """Get tokens owned by an FI (all of them unless limit is given)"""
     conn = get_db()
     cursor = conn.cursor()
     
@@ -422,37 +497,59 @@ def get_fi_tokens(fi_id: str) -> List[Dict]:
         SELECT serial_number, denomination, minted_at, last_transfer_at
         FROM tokens WHERE current_owner = ? AND status = 'active'
         ORDER BY denomination DESC
-    ''', (fi_id,))
+        LIMIT ? OFFSET ?
+    ''', (fi_id, limit, offset))
     
-    tokens = [dict(r) for r in cursor.fetchall()]
+    # Rows are left as sqlite3.Row; the API converts them while serializing
+    tokens = cursor.fetchall()
     conn.close()
     return tokens
 
 
-def get_money_supply() -> Dict:
-    """Get current money supply statistics"""
+def get_fi_token_summary(fi_id: str) -> Dict:
+    """Get an FI's balance, token count and per-denomination counts"""
     conn = get_db()
     cursor = conn.cursor()
     
-    # Total minted
-    cursor.execute('SELECT SUM(denomination) as total FROM tokens WHERE status != "destroyed"')
-    total_minted = cursor.fetchone()['total'] or 0
+    cursor.execute('''
+        SELECT SUM(denomination) as total, COUNT(*) as count
+        FROM tokens WHERE current_owner = ? AND status = 'active'
+    ''', (fi_id,))
+    result = cursor.fetchone()
     
-    # In CB vault
-    cursor.execute('SELECT SUM(denomination) as total FROM tokens WHERE current_owner = "CB" AND status = "active"')
-    in_cb = cursor.fetchone()['total'] or 0
+    cursor.execute('''
+        SELECT denomination, COUNT(*) as count
+        FROM tokens WHERE current_owner = ? AND status = 'active'
+        GROUP BY denomination ORDER BY denomination DESC
+    ''', (fi_id,))
+    breakdown = {r['denomination']: r['count'] for r in cursor.fetchall()}
     
-    # In FIs
-    cursor.execute('SELECT SUM(denomination) as total FROM tokens WHERE owner_type = "fi" AND status = "active"')
-    in_fis = cursor.fetchone()['total'] or 0
+    conn.close()
     
-    # In wallets
-    cursor.execute('SELECT SUM(denomination) as total FROM tokens WHERE owner_type = "wallet" AND status = "active"')
-    in_wallets = cursor.fetchone()['total'] or 0
+    return {
+        'fi_id': fi_id,
+        'total_balance': result['total'] or 0,
+        'token_count': result['count'],
+        'breakdown': breakdown
+    }
+
+
+def get_money_supply() -> Dict:
+    """Get current money supply statistics"""
+    conn = get_db()
+    cursor = conn.cursor()
     
-    # In sub-wallets
-    cursor.execute('SELECT SUM(denomination) as total FROM tokens WHERE owner_type = "subwallet" AND status = "active"')
-    in_subwallets = cursor.fetchone()['total'] or 0
+    # All supply buckets in a single pass over the tokens table
+    cursor.execute('''
+        SELECT
+            COALESCE(SUM(denomination), 0) as total,
+            COALESCE(SUM(CASE WHEN current_owner = 'CB' AND status = 'active' THEN denomination END), 0) as in_cb,
+            COALESCE(SUM(CASE WHEN owner_type = 'fi' AND status = 'active' THEN denomination END), 0) as in_fis,
+            COALESCE(SUM(CASE WHEN owner_type = 'wallet' AND status = 'active' THEN denomination END), 0) as in_wallets,
+            COALESCE(SUM(CASE WHEN owner_type = 'subwallet' AND status = 'active' THEN denomination END), 0) as in_subwallets
+        FROM tokens WHERE status != 'destroyed'
+    ''')
+    total_minted, in_cb, in_fis, in_wallets, in_subwallets = cursor.fetchone()
     
     # Token counts by denomination
     cursor.execute('''
@@ -477,35 +574,54 @@ def get_money_supply() -> Dict:
     }
 
 
-def get_ledger(limit: int = 100) -> List[Dict]:
+def get_ledger(limit: int = 100) -> List[sqlite3.Row]:
     """Get ledger entries"""
+    return list(iter_ledger(limit))
+
+
+def iter_ledger(limit: int = 100) -> Iterator[sqlite3.Row]:
+    """Yield ledger entries one at a time (for streaming responses)
+    Uses a pooled connection of its own: a streamed body is read after the request ends"""
+    with _pool.connection() as conn:
+        cursor = conn.execute(f'''
+            SELECT {_LEDGER_COLUMNS} FROM ledger l ORDER BY l.timestamp DESC LIMIT ?
+        ''', (limit,))
+        
+        yield from cursor
+
+
+def get_token_history(serial: str) -> List[sqlite3.Row]:
+    """Get ledger entries that moved a given token"""
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT * FROM ledger ORDER BY timestamp DESC LIMIT ?
-    ''', (limit,))
+    cursor.execute(f'''
+        SELECT {_LEDGER_COLUMNS} FROM ledger_serials ls
+        JOIN ledger l ON l.id = ls.ledger_id
+        WHERE ls.serial = ?
+        ORDER BY l.timestamp DESC
+    ''', (serial,))
     
-    entries = [dict(r) for r in cursor.fetchall()]
+    entries = cursor.fetchall()
     conn.close()
     return entries
 
 
-def get_all_fis() -> List[Dict]:
+def get_all_fis() -> List[sqlite3.Row]:
     """Get all registered FIs"""
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT fi_id, name, api_url, status, registered_at FROM financial_institutions')
-    fis = [dict(r) for r in cursor.fetchall()]
-    
-    # Add balance for each FI
-    for fi in fis:
-        cursor.execute('''
-            SELECT SUM(denomination) as balance FROM tokens 
-            WHERE current_owner = ? AND status = 'active'
-        ''', (fi['fi_id'],))
-        fi['balance'] = cursor.fetchone()['balance'] or 0
+    # Balances joined in, rather than one SUM query per FI
+    cursor.execute('''
+        SELECT fi.fi_id, fi.name, fi.api_url, fi.status, fi.registered_at,
+               COALESCE(SUM(t.denomination), 0) as balance
+        FROM financial_institutions fi
+        LEFT JOIN tokens t ON t.current_owner = fi.fi_id AND t.status = 'active'
+        GROUP BY fi.fi_id
+        ORDER BY fi.rowid
+    ''')
+    fis = cursor.fetchall()
     
     conn.close()
     return fis
@@ -513,38 +629,38 @@ def get_all_fis() -> List[Dict]:
 
 def transfer_tokens_between_fis(from_fi: str, to_fi: str, token_serials: List[str]) -> Dict:
     """Transfer tokens between FIs (for cross-FI transactions)"""
-    conn = get_db()
-    cursor = conn.cursor()
+    if len(set(token_serials)) != len(token_serials):
+        return {'error': 'Duplicate token serials in transfer'}
     
-    timestamp = int(time.time() * 1000)
-    total = 0
-    
-    for serial in token_serials:
-        # Verify ownership
-        cursor.execute('SELECT * FROM tokens WHERE serial_number = ? AND current_owner = ?', 
-                      (serial, from_fi))
-        token = cursor.fetchone()
-        if not token:
-            conn.close()
-            return {'error': f'Token {serial} not owned by {from_fi}'}
+    with _txn() as cursor:
+        timestamp = int(time.time() * 1000)
+        
+        # Verify ownership with IN queries, chunked to stay under SQLite's variable limit
+        owned = {}
+        for i in range(0, len(token_serials), IN_CHUNK_SIZE):
+            chunk = token_serials[i:i + IN_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'''
+                SELECT serial_number, denomination FROM tokens
+                WHERE current_owner = ? AND status = 'active' AND serial_number IN ({placeholders})
+            ''', (from_fi, *chunk))
+            owned.update((r['serial_number'], r['denomination']) for r in cursor.fetchall())
+        
+        missing = [serial for serial in token_serials if serial not in owned]
+        if missing:
+            return {'error': f'Token {missing[0]} not owned by {from_fi}', 'missing': missing}
         
-        total += token['denomination']
+        total = sum(owned[serial] for serial in token_serials)
         
         # Transfer
-        cursor.execute('''
-            UPDATE tokens SET current_owner = ?, last_transfer_at = ?
-            WHERE serial_number = ?
-        ''', (to_fi, timestamp, serial))
-    
-    # Record in ledger
-    tx_id = f"xfi-{secrets.token_hex(8)}"
-    cursor.execute('''
-        INSERT INTO ledger (id, transaction_type, from_entity, to_entity, token_serials, total_amount, timestamp)
-        VALUES (?, 'cross_fi_transfer', ?, ?, ?, ?, ?)
-    ''', (tx_id, from_fi, to_fi, str(token_serials), total, timestamp))
-    
-    conn.commit()
-    conn.close()
+        cursor.executemany(_TRANSFER_TOKEN_SQL, [(to_fi, timestamp, serial) for serial in token_serials])
+        
+        # Record in ledger
+        tx_id = f"xfi-{secrets.token_hex(8)}"
+        cursor.execute(_INSERT_LEDGER_SQL, (
+            tx_id, 'cross_fi_transfer', from_fi, to_fi, len(token_serials), total, None, timestamp
+        ))
+        record_ledger_serials(cursor, tx_id, token_serials)
     
     return {
         'success': True,
@@ -575,6 +691,3 @@ def validate_wallet(wallet_id: str) -> Dict:
     
     return {'valid': False, 'wallet_id': wallet_id}
 
-
-# Initialize on import
-init_db()
@@ -1,35 +1,173 @@
 """
 FI Node Flask API
 """
+import functools
+import hashlib
+import logging
 import os
 import sys
+import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, jsonify, request
+import orjson
+from flask import Flask, Response, abort, request
+from flask_compress import Compress
 from flask_cors import CORS
 from database import (
     FI_ID, FI_NAME,
     register_with_cb, request_allocation, get_fi_balance,
     create_wallet, get_wallet, get_all_wallets, allocate_to_wallet, get_wallet_details,
     create_subwallet, get_subwallets, allocate_to_subwallet, get_subwallet_details,
-    create_transaction, get_transactions, get_all_tokens,
+    create_transaction, iter_transactions, get_all_tokens,
     load_tokens_to_se, get_se_balance, offline_transaction,
     set_device_online_status, sync_subwallet,
     # Wallet SE operations
     load_tokens_to_wallet_se, get_wallet_se_balance, wallet_offline_transaction,
-    set_wallet_online_status, sync_wallet_offline_transactions
+    set_wallet_online_status, sync_wallet_offline_transactions,
+    release_db
 )
+from shared.http_utils import json_response
 from shared.token_utils import DENOMINATIONS
 
 app = Flask(__name__)
-CORS(app)
+
+# Let browsers cache preflight results for a day instead of re-sending OPTIONS
+CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
+CORS(app, resources={r"/api/*": {"origins": CORS_ORIGINS}}, max_age=86400)
+
+# Compress larger JSON responses (token and transaction lists)
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_LEVEL'] = 5
+app.config['COMPRESS_MIN_SIZE'] = 1024
+# Compressing a streamed response would buffer the whole generator first
+app.config['COMPRESS_STREAMS'] = False
+Compress(app)
 
 PORT = int(os.environ.get('FI_PORT', os.environ.get('PORT', 4001)))
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+logger = logging.getLogger('fi_node')
+
+# Endpoints the dashboard polls constantly; their access-log lines are dropped
+QUIET_PATHS = ('/api/health', '/api/balance')
+
+
+class _QuietPollFilter(logging.Filter):
+    """Filter werkzeug access-log records for QUIET_PATHS"""
+    
+    def filter(self, record):
+        message = record.getMessage()
+        return not any(f'"GET {path}' in message for path in QUIET_PATHS)
+
+
+logging.getLogger('werkzeug').addFilter(_QuietPollFilter())
+
+# Short-lived cache of serialized GET responses for dashboard polling,
+# keyed by path + query and cleared by any POST
+CACHE_TTL = float(os.environ.get('FI_CACHE_TTL', 2.0))
+CACHE_MAX_ENTRIES = 2048
+_response_cache = {}
+
+
+def stream_json_list(key, rows):
+    """Stream {key: [...]} one serialized row at a time instead of building the list"""
+    def generate():
+        yield b'{"%s":[' % key.encode()
+        first = True
+        for row in rows:
+            if not first:
+                yield b','
+            first = False
+            yield orjson.dumps(row)
+        yield b']}'
+    
+    return Response(generate(), mimetype='application/json')
+
+
+def _body():
+    """Parse the JSON request body once with orjson (empty -> {})
+    Malformed JSON or a non-object body is answered with a 400."""
+    try:
+        data = orjson.loads(request.get_data(cache=False) or b'{}')
+    except orjson.JSONDecodeError:
+        abort(json_response({'error': 'Invalid JSON body'}, 400))
+    if not isinstance(data, dict):
+        abort(json_response({'error': 'JSON body must be an object'}, 400))
+    return data
+
+
+def _content_etag(body):
+    """Short content hash used as an ETag"""
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def cached(view):
+    """Serve a successful GET response from the cache for CACHE_TTL seconds"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.full_path
+        now = time.monotonic()
+        hit = _response_cache.get(key)
+        if hit and hit[0] > now:
+            response = Response(hit[1], mimetype='application/json')
+            response.set_etag(hit[2])
+            return response
+        
+        response = view(*args, **kwargs)
+        if response.status_code == 200:
+            if len(_response_cache) >= CACHE_MAX_ENTRIES:
+                _response_cache.clear()
+            body = response.get_data()
+            etag = _content_etag(body)
+            response.set_etag(etag)
+            _response_cache[key] = (now + CACHE_TTL, body, etag)
+        return response
+    return wrapper
+
+
+def etagged(view):
+    """Answer If-None-Match with 304 when the response body is unchanged.
+    flask-compress sends the tag as "<hash>:gzip" to clients that accept gzip,
+    so the encoding suffix is ignored when comparing."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response = view(*args, **kwargs)
+        if response.status_code != 200:
+            return response
+        etag = response.get_etag()[0]
+        if not etag:
+            etag = _content_etag(response.get_data())
+            response.set_etag(etag)
+        
+        client_tags = request.if_none_match
+        for tag in client_tags.as_set(include_weak=True):
+            if tag.split(':', 1)[0] == etag:
+                not_modified = Response(status=304)
+                not_modified.set_etag(tag)
+                return not_modified
+        if client_tags.star_tag:
+            return Response(status=304)
+        return response
+    return wrapper
+
+
+@app.after_request
+def invalidate_cache(response):
+    """Any mutation may change balances, so drop every cached read"""
+    if request.method == 'POST':
+        _response_cache.clear()
+    return response
+
+
+@app.teardown_appcontext
+def release_connection(exc):
+    """Hand the request's connection back to the pool (a half-finished write is rolled back)"""
+    release_db()
+
 
 @app.route('/api/health')
 def health():
-    return jsonify({
+    return json_response({
         'status': 'ok', 
         'service': 'FI Node',
         'fi_id': FI_ID,
@@ -45,35 +183,37 @@ def api_register():
     """Register with Central Bank"""
     result = register_with_cb()
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 @app.route('/api/allocate', methods=['POST'])
 def api_request_allocation():
     """Request token allocation from CB"""
-    data = request.json
+    data = _body()
     amount = data.get('amount')
     
     if not amount or amount <= 0:
-        return jsonify({'error': 'Valid amount is required'}), 400
+        return json_response({'error': 'Valid amount is required'}, 400)
     
     result = request_allocation(amount)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 @app.route('/api/balance')
+@cached
 def api_balance():
     """Get FI balance"""
-    return jsonify(get_fi_balance())
+    return json_response(get_fi_balance())
 
 
 @app.route('/api/tokens')
+@cached
 def api_tokens():
     """Get all tokens in this FI"""
-    return jsonify(get_all_tokens())
+    return json_response(get_all_tokens())
 
 
 # ========== WALLET OPERATIONS ==========
@@ -81,48 +221,51 @@ def api_tokens():
 @app.route('/api/wallet/create', methods=['POST'])
 def api_create_wallet():
     """Create a new wallet"""
-    data = request.json
+    data = _body()
     name = data.get('name')
     
     if not name:
-        return jsonify({'error': 'name is required'}), 400
+        return json_response({'error': 'name is required'}, 400)
     
     result = create_wallet(name)
-    return jsonify(result)
+    return json_response(result)
 
 
 @app.route('/api/wallet/list')
+@cached
 def api_list_wallets():
     """List all wallets"""
     wallets = get_all_wallets()
-    return jsonify({'wallets': wallets})
+    return json_response({'wallets': wallets})
 
 
 @app.route('/api/wallet/<wallet_id>')
+@etagged
+@cached
 def api_get_wallet(wallet_id):
     """Get wallet details with tokens"""
     wallet = get_wallet(wallet_id)
     if not wallet:
-        return jsonify({'error': 'Wallet not found'}), 404
+        return json_response({'error': 'Wallet not found'}, 404)
     
     # Remove private key from response
     wallet.pop('private_key', None)
-    return jsonify(wallet)
+    return json_response(wallet)
 
 
 @app.route('/api/wallet/<wallet_id>/allocate', methods=['POST'])
 def api_allocate_to_wallet(wallet_id):
     """Allocate tokens to wallet"""
-    data = request.json
+    data = _body()
     amount = data.get('amount')
     
     if not amount or amount <= 0:
-        return jsonify({'error': 'Valid amount is required'}), 400
+        return json_response({'error': 'Valid amount is required'}, 400)
     
     result = allocate_to_wallet(wallet_id, amount)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 # ========== SUB-WALLET (IoT) OPERATIONS ==========
@@ -130,7 +273,7 @@ def api_allocate_to_wallet(wallet_id):
 @app.route('/api/wallet/<wallet_id>/device/register', methods=['POST'])
 def api_register_device(wallet_id):
     """Register IoT device (create sub-wallet)"""
-    data = request.json
+    data = _body()
     device_type = data.get('deviceType', 'generic')
     device_name = data.get('deviceName', 'Unknown Device')
     spending_limit = data.get('spendingLimit', 1000)
@@ -138,40 +281,42 @@ def api_register_device(wallet_id):
     
     result = create_subwallet(wallet_id, device_type, device_name, spending_limit, se_enabled)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 @app.route('/api/wallet/<wallet_id>/subwallets')
 def api_get_subwallets(wallet_id):
     """Get sub-wallets for a wallet"""
     subwallets = get_subwallets(wallet_id)
-    return jsonify({'subwallets': subwallets})
+    return json_response({'subwallets': subwallets})
 
 
 @app.route('/api/subwallet/<subwallet_id>')
+@etagged
+@cached
 def api_get_subwallet(subwallet_id):
     """Get detailed sub-wallet info"""
     details = get_subwallet_details(subwallet_id)
     if not details:
-        return jsonify({'error': 'Sub-wallet not found'}), 404
+        return json_response({'error': 'Sub-wallet not found'}, 404)
     details.pop('private_key', None)
-    return jsonify(details)
+    return json_response(details)
 
 
 @app.route('/api/wallet/<wallet_id>/subwallet/<subwallet_id>/allocate', methods=['POST'])
 def api_allocate_to_subwallet(wallet_id, subwallet_id):
     """Allocate tokens to sub-wallet"""
-    data = request.json
+    data = _body()
     amount = data.get('amount')
     
     if not amount or amount <= 0:
-        return jsonify({'error': 'Valid amount is required'}), 400
+        return json_response({'error': 'Valid amount is required'}, 400)
     
     result = allocate_to_subwallet(wallet_id, subwallet_id, amount)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 # ========== SECURE ELEMENT (SE) OPERATIONS ==========
@@ -179,52 +324,53 @@ def api_allocate_to_subwallet(wallet_id, subwallet_id):
 @app.route('/api/wallet/<wallet_id>/subwallet/<subwallet_id>/se/load', methods=['POST'])
 def api_load_to_se(wallet_id, subwallet_id):
     """Load tokens from wallet to IoT device's Secure Element"""
-    data = request.json
+    data = _body()
     amount = data.get('amount')
     
     if not amount or amount <= 0:
-        return jsonify({'error': 'Valid amount is required'}), 400
+        return json_response({'error': 'Valid amount is required'}, 400)
     
     result = load_tokens_to_se(wallet_id, subwallet_id, amount)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 @app.route('/api/subwallet/<subwallet_id>/se/balance')
+@cached
 def api_se_balance(subwallet_id):
     """Get Secure Element balance"""
     result = get_se_balance(subwallet_id)
-    return jsonify(result)
+    return json_response(result)
 
 
 @app.route('/api/subwallet/<subwallet_id>/offline/transaction', methods=['POST'])
 def api_offline_transaction(subwallet_id):
     """Create offline transaction using SE tokens"""
-    data = request.json
+    data = _body()
     to_id = data.get('toWallet') or data.get('to')
     amount = data.get('amount')
     description = data.get('description', 'Offline payment')
     
     if not to_id or not amount:
-        return jsonify({'error': 'to and amount are required'}), 400
+        return json_response({'error': 'to and amount are required'}, 400)
     
     result = offline_transaction(subwallet_id, to_id, amount, description)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 @app.route('/api/subwallet/<subwallet_id>/status', methods=['POST'])
 def api_set_device_status(subwallet_id):
     """Set device online/offline status"""
-    data = request.json
+    data = _body()
     is_online = data.get('isOnline', True)
     
     result = set_device_online_status(subwallet_id, is_online)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 @app.route('/api/subwallet/<subwallet_id>/sync', methods=['POST'])
@@ -232,8 +378,8 @@ def api_sync_subwallet(subwallet_id):
     """Sync offline transactions to network"""
     result = sync_subwallet(subwallet_id)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 # ========== WALLET SECURE ELEMENT (SE) OPERATIONS ==========
@@ -244,60 +390,61 @@ def api_wallet_details(wallet_id):
     """Get detailed wallet info including SE status"""
     details = get_wallet_details(wallet_id)
     if not details:
-        return jsonify({'error': 'Wallet not found'}), 404
+        return json_response({'error': 'Wallet not found'}, 404)
     details.pop('private_key', None)
-    return jsonify(details)
+    return json_response(details)
 
 
 @app.route('/api/wallet/<wallet_id>/se/load', methods=['POST'])
 def api_wallet_se_load(wallet_id):
     """Load tokens from wallet to wallet's Secure Element for offline use"""
-    data = request.json
+    data = _body()
     amount = data.get('amount')
     
     if not amount or amount <= 0:
-        return jsonify({'error': 'Valid amount is required'}), 400
+        return json_response({'error': 'Valid amount is required'}, 400)
     
     result = load_tokens_to_wallet_se(wallet_id, amount)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 @app.route('/api/wallet/<wallet_id>/se/balance')
+@cached
 def api_wallet_se_balance(wallet_id):
     """Get wallet Secure Element balance"""
     result = get_wallet_se_balance(wallet_id)
-    return jsonify(result)
+    return json_response(result)
 
 
 @app.route('/api/wallet/<wallet_id>/offline/transaction', methods=['POST'])
 def api_wallet_offline_transaction(wallet_id):
     """Create offline wallet-to-wallet transaction using SE tokens with ZKP"""
-    data = request.json
+    data = _body()
     to_wallet = data.get('toWallet') or data.get('to')
     amount = data.get('amount')
     description = data.get('description', 'Offline payment')
     
     if not to_wallet or not amount:
-        return jsonify({'error': 'toWallet and amount are required'}), 400
+        return json_response({'error': 'toWallet and amount are required'}, 400)
     
     result = wallet_offline_transaction(wallet_id, to_wallet, amount, description)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 @app.route('/api/wallet/<wallet_id>/status', methods=['POST'])
 def api_wallet_status(wallet_id):
     """Set wallet online/offline status"""
-    data = request.json
+    data = _body()
     is_online = data.get('isOnline', True)
     
     result = set_wallet_online_status(wallet_id, is_online)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 @app.route('/api/wallet/<wallet_id>/sync', methods=['POST'])
@@ -305,8 +452,8 @@ def api_wallet_sync(wallet_id):
     """Sync wallet's offline transactions to network"""
     result = sync_wallet_offline_transactions(wallet_id)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 # ========== TRANSACTIONS ==========
@@ -314,7 +461,7 @@ def api_wallet_sync(wallet_id):
 @app.route('/api/transaction/create', methods=['POST'])
 def api_create_transaction():
     """Create a token transaction"""
-    data = request.json
+    data = _body()
     from_id = data.get('fromWallet') or data.get('from')
     to_id = data.get('toWallet') or data.get('to')
     amount = data.get('amount')
@@ -322,12 +469,12 @@ def api_create_transaction():
     to_fi = data.get('toFi')
     
     if not all([from_id, to_id, amount]):
-        return jsonify({'error': 'from, to, and amount are required'}), 400
+        return json_response({'error': 'from, to, and amount are required'}, 400)
     
     result = create_transaction(from_id, to_id, amount, description, to_fi)
     if 'error' in result:
-        return jsonify(result), 400
-    return jsonify(result)
+        return json_response(result, 400)
+    return json_response(result)
 
 
 @app.route('/api/transactions')
@@ -336,26 +483,33 @@ def api_get_transactions():
     entity_id = request.args.get('entity')
     limit = request.args.get('limit', 50, type=int)
     
-    transactions = get_transactions(entity_id, limit)
-    return jsonify({'transactions': transactions})
+    return stream_json_list('transactions', iter_transactions(entity_id, limit))
 
 
 @app.route('/api/wallet/<wallet_id>/transactions')
 def api_wallet_transactions(wallet_id):
     """Get wallet transactions"""
-    transactions = get_transactions(wallet_id)
-    return jsonify({'transactions': transactions})
+    return stream_json_list('transactions', iter_transactions(wallet_id))
 
 
-if __name__ == '__main__':
-    print(f"🏦 {FI_NAME} (Token-Based) starting on port {PORT}")
-    print(f"📜 Valid denominations: {DENOMINATIONS}")
-    
-    # Auto-register with CB
+def register_on_startup():
+    """Auto-register with CB when the node starts
+    Every gunicorn worker calls this, so the CB's duplicate answer counts as registered"""
     reg_result = register_with_cb()
     if 'error' not in reg_result:
-        print(f"✅ Registered with Central Bank")
+        logger.info("Registered with Central Bank")
+    elif reg_result['error'] == 'FI already registered':
+        logger.info("Already registered with Central Bank")
     else:
-        print(f"⚠️ CB registration: {reg_result.get('error', 'Unknown error')}")
+        logger.warning("CB registration: %s", reg_result.get('error', 'Unknown error'))
+
+
+if __name__ == '__main__':
+    logger.info("%s (Token-Based) starting on port %s", FI_NAME, PORT)
+    logger.info("Valid denominations: %s", DENOMINATIONS)
+    
+    register_on_startup()
     
-    app.run(host='0.0.0.0', port=PORT, debug=True)
+    # Development server only; production runs under gunicorn via wsgi.py
+    debug = os.environ.get('FLASK_DEBUG', '0') == '1'
+    app.run(host='0.0.0.0', port=PORT, debug=debug, threaded=True)
@@ -7,13 +7,14 @@ import os
 import time
 import secrets
 import json
-import requests
-from typing import Dict, List, Optional, Tuple
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.db import ConnectionPool
 from shared.token_utils import (
     generate_serial_number, DENOMINATIONS, make_change, 
-    tokens_to_amount, calculate_change
+    tokens_to_amount, calculate_change, select_tokens
 )
 from shared.zkp import (
     generate_keypair, generate_ownership_proof, 
@@ -25,23 +26,33 @@ FI_ID = os.environ.get('FI_ID', 'fi-default')
 FI_NAME = os.environ.get('FI_NAME', 'Default FI')
 CB_URL = os.environ.get('CB_URL', 'http://localhost:4000')
 
+logger = logging.getLogger('fi_node')
+
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 DB_PATH = os.path.join(DATA_DIR, f'{FI_ID}.db')
 
+# Schema is created on first connection rather than at import, so importing
+# this module (and forking gunicorn workers) stays cheap
+_pool = ConnectionPool(lambda: DB_PATH, lambda conn: init_db(conn))
+
 
 def get_db():
-    """Get database connection"""
-    os.makedirs(DATA_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get this request's database connection from the pool"""
+    return _pool.get()
+
 
+def release_db():
+    """Return this request's connection to the pool, discarding uncommitted work"""
+    _pool.release()
 
-def init_db():
+
+def init_db(conn: sqlite3.Connection):
     """Initialize database schema"""
-    conn = get_db()
     cursor = conn.cursor()
     
+    # Write-ahead logging lets readers run concurrently with a writer
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
     # Wallets table - now with Secure Element support
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS wallets (
@@ -185,12 +196,12 @@ def init_db():
     ''')
     
     conn.commit()
-    conn.close()
-    print(f"✅ FI Node database initialized for {FI_NAME}")
+    logger.info("FI Node database initialized for %s", FI_NAME)
 
 
 def register_with_cb() -> Dict:
     """Register this FI with Central Bank"""
+    import requests  # only needed for CB calls; keeps module import light
     try:
         response = requests.post(f"{CB_URL}/api/fi/register", json={
             'fi_id': FI_ID,
@@ -204,6 +215,7 @@ def register_with_cb() -> Dict:
 
 def request_allocation(amount: int) -> Dict:
     """Request token allocation from Central Bank"""
+    import requests
     try:
         response = requests.post(f"{CB_URL}/api/fi/{FI_ID}/allocate", json={
             'amount': amount
@@ -365,13 +377,7 @@ def allocate_to_wallet(wallet_id: str, amount: int) -> Dict:
     fi_tokens = [dict(r) for r in cursor.fetchall()]
     
     # Select tokens for transfer
-    selected = []
-    total = 0
-    for token in fi_tokens:
-        if total >= amount:
-            break
-        selected.append(token)
-        total += token['denomination']
+    selected, total = select_tokens(fi_tokens, amount)
     
     if total < amount:
         conn.close()
@@ -527,13 +533,7 @@ def allocate_to_subwallet(wallet_id: str, subwallet_id: str, amount: int) -> Dic
     wallet_tokens = [dict(r) for r in cursor.fetchall()]
     
     # Select tokens
-    selected = []
-    total = 0
-    for token in wallet_tokens:
-        if total >= amount:
-            break
-        selected.append(token)
-        total += token['denomination']
+    selected, total = select_tokens(wallet_tokens, amount)
     
     if total < amount:
         conn.close()
@@ -604,13 +604,7 @@ def load_tokens_to_se(wallet_id: str, subwallet_id: str, amount: int) -> Dict:
     wallet_tokens = [dict(r) for r in cursor.fetchall()]
     
     # Select tokens up to amount (prefer smaller denominations for SE)
-    selected = []
-    total = 0
-    for token in wallet_tokens:
-        if total >= amount:
-            break
-        selected.append(token)
-        total += token['denomination']
+    selected, total = select_tokens(wallet_tokens, amount)
     
     if total < amount:
         conn.close()
@@ -700,13 +694,7 @@ def offline_transaction(subwallet_id: str, to_id: str, amount: int, description:
     se_tokens = [dict(r) for r in cursor.fetchall()]
     
     # Select tokens for payment
-    selected = []
-    total = 0
-    for token in se_tokens:
-        if total >= amount:
-            break
-        selected.append(token)
-        total += token['denomination']
+    selected, total = select_tokens(se_tokens, amount)
     
     if total < amount:
         conn.close()
@@ -807,36 +795,42 @@ def sync_subwallet(subwallet_id: str) -> Dict:
     
     timestamp = int(time.time() * 1000)
     synced_txs = []
+    token_rows = []
+    se_rows = []
+    tx_rows = []
     
     for tx in pending:
-        token_serials = json.loads(tx['token_serials'])
-        
-        # Update token ownership in main ledger
-        for serial in token_serials:
-            cursor.execute('''
-                UPDATE tokens SET owner_id = ?, owner_type = 'external', last_updated = ?
-                WHERE serial_number = ?
-            ''', (tx['to_id'], timestamp, serial))
-            
-            # Remove from SE
-            cursor.execute('''
-                DELETE FROM secure_element WHERE subwallet_id = ? AND serial_number = ?
-            ''', (subwallet_id, serial))
-        
-        # Mark offline transaction as synced
-        cursor.execute('''
-            UPDATE offline_transactions SET synced = 1, synced_at = ? WHERE id = ?
-        ''', (timestamp, tx['id']))
-        
-        # Create main transaction record
-        cursor.execute('''
-            INSERT INTO transactions (id, from_id, to_id, token_serials, amount, description, status, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, 'synced', ?)
-        ''', (tx['id'], tx['from_id'], tx['to_id'], tx['token_serials'], 
-              tx['amount'], f"[SYNCED] {tx['description']}", timestamp))
+        for serial in json.loads(tx['token_serials']):
+            token_rows.append((tx['to_id'], timestamp, serial))
+            se_rows.append((subwallet_id, serial))
         
+        tx_rows.append((tx['id'], tx['from_id'], tx['to_id'], tx['token_serials'],
+                        tx['amount'], f"[SYNCED] {tx['description']}", timestamp))
         synced_txs.append(tx['id'])
     
+    # Replay every pending transaction as one batch per statement
+    # Update token ownership in main ledger
+    cursor.executemany('''
+        UPDATE tokens SET owner_id = ?, owner_type = 'external', last_updated = ?
+        WHERE serial_number = ?
+    ''', token_rows)
+    
+    # Remove from SE
+    cursor.executemany('''
+        DELETE FROM secure_element WHERE subwallet_id = ? AND serial_number = ?
+    ''', se_rows)
+    
+    # Mark offline transactions as synced
+    cursor.executemany('''
+        UPDATE offline_transactions SET synced = 1, synced_at = ? WHERE id = ?
+    ''', [(timestamp, tx_id) for tx_id in synced_txs])
+    
+    # Create main transaction records
+    cursor.executemany('''
+        INSERT INTO transactions (id, from_id, to_id, token_serials, amount, description, status, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, 'synced', ?)
+    ''', tx_rows)
+    
     # Update last sync time
     cursor.execute('''
         UPDATE subwallets SET last_sync = ?, is_online = 1 WHERE subwallet_id = ?
@@ -922,13 +916,7 @@ def load_tokens_to_wallet_se(wallet_id: str, amount: int) -> Dict:
     available_tokens = [dict(r) for r in cursor.fetchall()]
     
     # Select tokens up to amount
-    selected = []
-    total = 0
-    for token in available_tokens:
-        if total >= amount:
-            break
-        selected.append(token)
-        total += token['denomination']
+    selected, total = select_tokens(available_tokens, amount)
     
     if total < amount:
         conn.close()
@@ -1002,13 +990,7 @@ def wallet_offline_transaction(from_wallet: str, to_wallet: str, amount: int, de
     se_tokens = [dict(r) for r in cursor.fetchall()]
     
     # Select tokens for payment
-    selected = []
-    total = 0
-    for token in se_tokens:
-        if total >= amount:
-            break
-        selected.append(token)
-        total += token['denomination']
+    selected, total = select_tokens(se_tokens, amount)
     
     if total < amount:
         conn.close()
@@ -1112,36 +1094,42 @@ def sync_wallet_offline_transactions(wallet_id: str) -> Dict:
     
     timestamp = int(time.time() * 1000)
     synced_txs = []
+    token_rows = []
+    se_rows = []
+    tx_rows = []
     
     for tx in pending:
-        token_serials = json.loads(tx['token_serials'])
-        
-        # Update token ownership in main ledger
-        for serial in token_serials:
-            cursor.execute('''
-                UPDATE tokens SET owner_id = ?, owner_type = 'wallet', last_updated = ?
-                WHERE serial_number = ?
-            ''', (tx['to_wallet'], timestamp, serial))
-            
-            # Remove from wallet SE
-            cursor.execute('''
-                DELETE FROM wallet_secure_element WHERE wallet_id = ? AND serial_number = ?
-            ''', (wallet_id, serial))
-        
-        # Mark offline transaction as synced
-        cursor.execute('''
-            UPDATE wallet_offline_transactions SET synced = 1, synced_at = ? WHERE id = ?
-        ''', (timestamp, tx['id']))
-        
-        # Create main transaction record
-        cursor.execute('''
-            INSERT INTO transactions (id, from_id, to_id, token_serials, amount, description, zkp_proof, status, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 'synced', ?)
-        ''', (tx['id'], tx['from_wallet'], tx['to_wallet'], tx['token_serials'], 
-              tx['amount'], f"[SYNCED] {tx['description']}", tx['zkp_proof'], timestamp))
+        for serial in json.loads(tx['token_serials']):
+            token_rows.append((tx['to_wallet'], timestamp, serial))
+            se_rows.append((wallet_id, serial))
         
+        tx_rows.append((tx['id'], tx['from_wallet'], tx['to_wallet'], tx['token_serials'],
+                        tx['amount'], f"[SYNCED] {tx['description']}", tx['zkp_proof'], timestamp))
         synced_txs.append(tx['id'])
     
+    # Replay every pending transaction as one batch per statement
+    # Update token ownership in main ledger
+    cursor.executemany('''
+        UPDATE tokens SET owner_id = ?, owner_type = 'wallet', last_updated = ?
+        WHERE serial_number = ?
+    ''', token_rows)
+    
+    # Remove from wallet SE
+    cursor.executemany('''
+        DELETE FROM wallet_secure_element WHERE wallet_id = ? AND serial_number = ?
+    ''', se_rows)
+    
+    # Mark offline transactions as synced
+    cursor.executemany('''
+        UPDATE wallet_offline_transactions SET synced = 1, synced_at = ? WHERE id = ?
+    ''', [(timestamp, tx_id) for tx_id in synced_txs])
+    
+    # Create main transaction records
+    cursor.executemany('''
+        INSERT INTO transactions (id, from_id, to_id, token_serials, amount, description, zkp_proof, status, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'synced', ?)
+    ''', tx_rows)
+    
     # Update last sync time
     cursor.execute('''
         UPDATE wallets SET last_sync = ?, is_online = 1 WHERE wallet_id = ?
@@ -1233,13 +1221,7 @@ def create_transaction(from_id: str, to_id: str, amount: int,
     sender_tokens = [dict(r) for r in cursor.fetchall()]
     
     # Select tokens for payment
-    selected = []
-    total = 0
-    for token in sender_tokens:
-        if total >= amount:
-            break
-        selected.append(token)
-        total += token['denomination']
+    selected, total = select_tokens(sender_tokens, amount)
     
     if total < amount:
         conn.close()
@@ -1270,6 +1252,7 @@ def create_transaction(from_id: str, to_id: str, amount: int,
     
     if is_cross_fi:
         # For cross-FI, notify Central Bank
+        import requests
         try:
             cb_response = requests.post(f"{CB_URL}/api/fi/transfer", json={
                 'from_fi': FI_ID,
@@ -1328,23 +1311,26 @@ def create_transaction(from_id: str, to_id: str, amount: int,
 
 def get_transactions(entity_id: str = None, limit: int = 50) -> List[Dict]:
     """Get transactions"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    if entity_id:
-        cursor.execute('''
-            SELECT * FROM transactions 
-            WHERE from_id = ? OR to_id = ?
-            ORDER BY timestamp DESC LIMIT ?
-        ''', (entity_id, entity_id, limit))
-    else:
-        cursor.execute('''
-            SELECT * FROM transactions ORDER BY timestamp DESC LIMIT ?
-        ''', (limit,))
-    
-    transactions = [dict(r) for r in cursor.fetchall()]
-    conn.close()
-    return transactions
+    return list(iter_transactions(entity_id, limit))
+
+
+def iter_transactions(entity_id: str = None, limit: int = 50) -> Iterator[Dict]:
+    """Yield transactions one at a time (for streaming responses)
+    Uses a pooled connection of its own: a streamed body is read after the request ends"""
+    with _pool.connection() as conn:
+        if entity_id:
+            cursor = conn.execute('''
+                SELECT * FROM transactions 
+                WHERE from_id = ? OR to_id = ?
+                ORDER BY timestamp DESC LIMIT ?
+            ''', (entity_id, entity_id, limit))
+        else:
+            cursor = conn.execute('''
+                SELECT * FROM transactions ORDER BY timestamp DESC LIMIT ?
+            ''', (limit,))
+        
+        for row in cursor:
+            yield dict(row)
 
 
 def get_all_tokens() -> Dict:
@@ -1388,6 +1374,3 @@ def get_all_tokens() -> Dict:
         }
     }
 
-
-# Initialize on import
-init_db()
@@ -0,0 +1,11 @@
+"""
+FI Node WSGI entrypoint
+Usage (from fi_node/):
+    FI_ID=sbi FI_NAME="State Bank of India" FI_PORT=4001 \
+        gunicorn -c ../gunicorn_conf.py -k gevent -b 0.0.0.0:4001 wsgi:application
+Each worker registers with the Central Bank on import; after the first,
+the CB answers "FI already registered", which the node treats as success.
+"""
+from app import app as application, register_on_startup
+
+register_on_startup()
@@ -0,0 +1,22 @@
+"""
+Gunicorn settings shared by the CBDC services
+Usage (from a service directory):
+    gunicorn -c ../gunicorn_conf.py -b 0.0.0.0:4000 app:app
+    gunicorn -c ../gunicorn_conf.py -k gevent -b 0.0.0.0:4001 wsgi:application
+    gunicorn -c ../gunicorn_conf.py -k gevent -w 4 -b 0.0.0.0:3000 wsgi:application
+"""
+import os
+
+# Worker processes, each running a pool of threads
+workers = int(os.environ.get('WEB_CONCURRENCY', (os.cpu_count() or 1) * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# gthread by default; the FI nodes and the dashboard spend most of a request
+# waiting on another service, so they can run gevent workers. The dashboard
+# needs -k gevent: every open /api/stream (SSE) client would otherwise hold
+# one of the few gthread threads for as long as the page is open.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Hold idle client connections open for the dashboard's polling
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 30))
@@ -0,0 +1,109 @@
+"""
+SQLite connection pool shared by the Central Bank and FI node databases
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator
+
+# Per-connection tuning (WAL itself is persistent and set by each init_db)
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',       # safe under WAL, avoids fsync per commit
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-20000',        # ~20 MB page cache
+)
+
+
+class PooledConnection(sqlite3.Connection):
+    """Pool-owned connection: close() only discards uncommitted work"""
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+
+class ConnectionPool:
+    """
+    Per-process pool of SQLite connections
+    get() binds a connection to the calling thread (a greenlet under gevent
+    workers) until release(), so every get_db() within one request shares it.
+    release() hands it back to the pool instead of closing it, so the
+    short-lived greenlets of gevent workers reuse connections as well.
+    """
+
+    def __init__(self, path: Callable[[], str], init_schema: Callable[[sqlite3.Connection], None],
+                 pragmas: Iterable[str] = CONNECTION_PRAGMAS, max_idle: int = 16, **connect_kwargs):
+        self._path = path                  # called per connect, so DB_PATH can be repointed
+        self._pragmas = tuple(pragmas)
+        self._init_schema = init_schema
+        self._max_idle = max_idle
+        self._connect_kwargs = connect_kwargs
+
+        self._idle = []
+        self._idle_lock = threading.Lock()
+        self._bound = threading.local()
+
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def get(self) -> sqlite3.Connection:
+        """Get the connection bound to this thread, checking one out if needed"""
+        conn = getattr(self._bound, 'conn', None)
+        if conn is None:
+            conn = self._checkout()
+            self._bound.conn = conn
+        return conn
+
+    def release(self):
+        """Return this thread's connection to the pool, rolling back uncommitted work"""
+        conn = getattr(self._bound, 'conn', None)
+        if conn is not None:
+            self._bound.conn = None
+            self._checkin(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """A connection of its own for the block, e.g. for a streamed response
+        that outlives the request's bound connection"""
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    def _checkout(self) -> sqlite3.Connection:
+        with self._idle_lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _checkin(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._idle_lock:
+            if len(self._idle) < self._max_idle:
+                self._idle.append(conn)
+                return
+        sqlite3.Connection.close(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        path = self._path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, factory=PooledConnection, check_same_thread=False,
+                               **self._connect_kwargs)
+        conn.row_factory = sqlite3.Row
+        for pragma in self._pragmas:
+            conn.execute(pragma)
+        self._ensure_schema(conn)
+        return conn
+
+    def _ensure_schema(self, conn: sqlite3.Connection):
+        """Run init_schema once per process, on the first connection"""
+        if self._schema_ready:
+            return
+
+        with self._schema_lock:
+            if not self._schema_ready:
+                self._init_schema(conn)
+                self._schema_ready = True
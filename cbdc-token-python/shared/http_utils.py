@@ -0,0 +1,20 @@
+"""
+HTTP helpers shared by the CBDC Flask services
+"""
+import sqlite3
+
+import orjson
+from flask import Response
+
+
+def row_default(obj):
+    """orjson fallback: database rows are only turned into dicts here"""
+    if isinstance(obj, sqlite3.Row):
+        return dict(obj)
+    raise TypeError
+
+
+def json_response(payload, status=200):
+    """Serialize with orjson, which is much faster than jsonify on large payloads"""
+    return Response(orjson.dumps(payload, default=row_default, option=orjson.OPT_NON_STR_KEYS),
+                    status=status, mimetype='application/json')
@@ -5,24 +5,54 @@ Manages token denominations, serial numbers, and token operations
 import hashlib
 import time
 import secrets
+import struct
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate
+from operator import itemgetter
 from typing import List, Dict, Tuple, Optional
 
 # Valid denominations in Indian Rupees
 DENOMINATIONS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 2000]
 
+_get_denomination = itemgetter('denomination')
+
+# Derived once for the hot paths: largest-first for change making, set for lookups
+_DENOMS_DESC = tuple(sorted(DENOMINATIONS, reverse=True))
+DENOMINATION_SET = frozenset(DENOMINATIONS)
+
+
+def now_ms() -> int:
+    """Current time in integer milliseconds (no float round trip)"""
+    return time.time_ns() // 1_000_000
+
+
 def generate_serial_number(issuer_id: str, denomination: int, batch_id: str = None) -> str:
     """Generate unique serial number for a token"""
-    timestamp = int(time.time() * 1000)
-    random_part = secrets.token_hex(8)
-    batch = batch_id or secrets.token_hex(4)
+    timestamp = now_ms()
+    random_part = secrets.token_bytes(8)
+    batch = batch_id.encode() if batch_id else secrets.token_bytes(4)
     
-    data = f"{issuer_id}|{denomination}|{batch}|{timestamp}|{random_part}"
-    hash_value = hashlib.sha256(data.encode()).hexdigest()[:16].upper()
+    # Not security-critical, so a BLAKE2 digest sized to the 16 hex chars we keep
+    h = hashlib.blake2b(f"{issuer_id}|{denomination}|".encode(), digest_size=8)
+    h.update(batch)
+    h.update(struct.pack('<q', timestamp))
+    h.update(random_part)
+    hash_value = h.hexdigest().upper()
     
     # Format: DEN-HASH (e.g., 500-A1B2C3D4E5F6G7H8)
     return f"{denomination}-{hash_value}"
 
 
+def generate_serial_numbers(denomination: int, count: int) -> List[str]:
+    """
+    Generate serial numbers for a whole batch of tokens at once
+    Same DEN-HASH format as generate_serial_number, drawing all randomness in one call
+    """
+    hexed = secrets.token_bytes(8 * count).hex().upper()
+    return [f"{denomination}-{hexed[i:i + 16]}" for i in range(0, 16 * count, 16)]
+
+
 def generate_nullifier(serial_number: str, owner_private_key: str, nonce: str = None) -> str:
     """Generate nullifier for spent token (prevents double-spending)"""
     n = nonce or secrets.token_hex(16)
@@ -40,17 +70,10 @@ def calculate_change(amount: int, available_tokens: List[Dict]) -> Tuple[List[Di
         - remaining: Amount that couldn't be covered (should be 0)
     """
     # Sort tokens by denomination (largest first for efficiency)
-    sorted_tokens = sorted(available_tokens, key=lambda t: t['denomination'], reverse=True)
-    
-    tokens_to_spend = []
-    total_spent = 0
+    sorted_tokens = sorted(available_tokens, key=_get_denomination, reverse=True)
     
     # Greedy selection
-    for token in sorted_tokens:
-        if total_spent >= amount:
-            break
-        tokens_to_spend.append(token)
-        total_spent += token['denomination']
+    tokens_to_spend, total_spent = select_tokens(sorted_tokens, amount)
     
     if total_spent < amount:
         return [], [], amount - total_spent  # Insufficient funds
@@ -61,6 +84,23 @@ def calculate_change(amount: int, available_tokens: List[Dict]) -> Tuple[List[Di
     return tokens_to_spend, change_tokens, 0
 
 
+def select_tokens(tokens: List[Dict], amount: int) -> Tuple[List[Dict], int]:
+    """
+    Take tokens in the given order until they cover amount
+    Running totals and bisect do the scan in C rather than a per-token Python loop
+    
+    Returns:
+        - selected: Leading tokens used (all of them if they fall short)
+        - total: Their combined value (less than amount if insufficient)
+    """
+    running = list(accumulate(map(_get_denomination, tokens)))
+    if not running or running[-1] < amount:
+        return list(tokens), running[-1] if running else 0
+    
+    cut = bisect_left(running, amount) + 1 if amount > 0 else 0
+    return tokens[:cut], running[cut - 1] if cut else 0
+
+
 def make_change(amount: int) -> List[int]:
     """
     Break down an amount into optimal denomination tokens
@@ -72,22 +112,62 @@ def make_change(amount: int) -> List[int]:
     change = []
     remaining = amount
     
-    for denom in sorted(DENOMINATIONS, reverse=True):
-        while remaining >= denom:
-            change.append(denom)
-            remaining -= denom
+    for denom in _DENOMS_DESC:
+        count, remaining = divmod(remaining, denom)
+        if count:
+            change.extend((denom,) * count)
+        if not remaining:
+            break
     
     return change
 
 
+def make_change_counts(amount: int) -> Dict[int, int]:
+    """
+    Break down an amount into {denomination: count} without listing each token
+    Same greedy result as make_change, computed arithmetically per denomination
+    """
+    counts = {}
+    remaining = amount
+    
+    for denom in _DENOMS_DESC:
+        if remaining <= 0:
+            break
+        count, remaining = divmod(remaining, denom)
+        if count:
+            counts[denom] = count
+    
+    return counts
+
+
+def make_change_from(amount: int, available: Dict[int, int]) -> Tuple[Dict[int, int], int]:
+    """
+    Greedy change-making limited by how many tokens of each denomination exist
+    
+    Returns:
+        - counts: {denomination: number of tokens to use}
+        - remaining: Amount that couldn't be covered (0 if exact)
+    """
+    counts = {}
+    remaining = amount
+    
+    for denom in sorted(available, reverse=True):
+        use = min(available[denom], remaining // denom)
+        if use > 0:
+            counts[denom] = use
+            remaining -= use * denom
+    
+    return counts, remaining
+
+
 def validate_denomination(amount: int) -> bool:
     """Check if amount is a valid denomination"""
-    return amount in DENOMINATIONS
+    return amount in DENOMINATION_SET
 
 
 def tokens_to_amount(tokens: List[Dict]) -> int:
     """Calculate total value of tokens"""
-    return sum(t.get('denomination', 0) for t in tokens)
+    return sum(map(_get_denomination, tokens))
 
 
 def break_token(token: Dict, target_amount: int) -> Tuple[List[int], List[int]]:
@@ -119,10 +199,7 @@ def format_token_display(tokens: List[Dict]) -> str:
         return "No tokens"
     
     # Group by denomination
-    by_denom = {}
-    for t in tokens:
-        d = t.get('denomination', 0)
-        by_denom[d] = by_denom.get(d, 0) + 1
+    by_denom = Counter(map(_get_denomination, tokens))
     
     parts = []
     for denom in sorted(by_denom.keys(), reverse=True):
@@ -149,11 +226,7 @@ class TokenBundle:
     
     def by_denomination(self) -> Dict[int, int]:
         """Group tokens by denomination"""
-        result = {}
-        for t in self.tokens:
-            d = t['denomination']
-            result[d] = result.get(d, 0) + 1
-        return result
+        return dict(Counter(map(_get_denomination, self.tokens)))
     
     def select_for_payment(self, amount: int) -> Tuple[List[Dict], int]:
         """Select tokens for a payment, returns (selected_tokens, change_needed)"""
@@ -6,9 +6,10 @@ Simulates ZKP for:
 3. Double-spending prevention
 """
 import hashlib
-import time
 import secrets
 from typing import Dict, Any, Optional
+import orjson
+from shared.token_utils import now_ms
 
 # Compliance limits
 COMPLIANCE_LIMITS = {
@@ -44,7 +45,7 @@ def generate_ownership_proof(private_key: str, public_key: str,
     Generate ZKP proof for token/wallet ownership
     Proves: "I own this token/wallet" without revealing private key
     """
-    timestamp = int(time.time() * 1000)
+    timestamp = now_ms()
     nonce = secrets.token_hex(16)
     challenge_value = challenge or secrets.token_hex(32)
     
@@ -56,10 +57,7 @@ def generate_ownership_proof(private_key: str, public_key: str,
     signature = hashlib.sha256(sign_data.encode()).hexdigest()
     
     # Verification hash (can be verified without private key)
-    verify_data = f"{public_key}|{challenge_value}|{timestamp}"
-    if token_serial:
-        verify_data += f"|{token_serial}"
-    verification_hash = hashlib.sha256(verify_data.encode()).hexdigest()[:16]
+    verification_hash = _vtag(public_key, challenge_value, timestamp, token_serial)
     
     return {
         'type': 'ownership',
@@ -73,6 +71,19 @@ def generate_ownership_proof(private_key: str, public_key: str,
     }
 
 
+def _vtag(public_key: str, challenge: str, timestamp: int, token_serial: str = None) -> str:
+    """Ownership verification hash: 'pk|challenge|ts[|serial]' -> first 8 SHA-256 bytes as hex"""
+    buf = bytearray(public_key.encode())
+    buf += b'|'
+    buf += challenge.encode()
+    buf += b'|'
+    buf += str(timestamp).encode()
+    if token_serial:
+        buf += b'|'
+        buf += token_serial.encode()
+    return hashlib.sha256(buf).digest()[:8].hex()
+
+
 def verify_ownership_proof(proof: Dict, expected_public_key: str) -> bool:
     """Verify ownership proof"""
     if proof.get('type') != 'ownership':
@@ -81,15 +92,13 @@ def verify_ownership_proof(proof: Dict, expected_public_key: str) -> bool:
         return False
     
     # Check timestamp freshness (5 minutes)
-    age = int(time.time() * 1000) - proof.get('timestamp', 0)
+    age = now_ms() - proof.get('timestamp', 0)
     if age > 5 * 60 * 1000:
         return False
     
     # Verify hash
-    verify_data = f"{proof['public_key']}|{proof['challenge']}|{proof['timestamp']}"
-    if proof.get('token_serial'):
-        verify_data += f"|{proof['token_serial']}"
-    expected_hash = hashlib.sha256(verify_data.encode()).hexdigest()[:16]
+    expected_hash = _vtag(proof['public_key'], proof['challenge'], proof['timestamp'],
+                          proof.get('token_serial'))
     
     return proof.get('verification_hash') == expected_hash
 
@@ -108,10 +117,10 @@ def generate_token_transfer_proof(
     2. Tokens are valid (not spent)
     3. Total matches claimed amount
     """
-    timestamp = int(time.time() * 1000)
+    timestamp = now_ms()
     nonce = secrets.token_hex(16)
     
-    # Transaction hash
+    # Transaction hash over a canonical (sorted-key) JSON encoding
     tx_data = {
         'from': sender_public_key,
         'to': recipient_public_key,
@@ -119,17 +128,14 @@ def generate_token_transfer_proof(
         'amount': amount,
         'timestamp': timestamp
     }
-    tx_hash = hashlib.sha256(str(tx_data).encode()).hexdigest()
+    tx_hash = hashlib.sha256(orjson.dumps(tx_data, option=orjson.OPT_SORT_KEYS)).hexdigest()
     
     # Signature
     sign_data = f"{sender_private_key}|{tx_hash}|{nonce}"
     signature = hashlib.sha256(sign_data.encode()).hexdigest()
     
     # Generate nullifiers for each token (prevents double-spending)
-    nullifiers = [
-        generate_nullifier(serial, sender_private_key, nonce)
-        for serial in token_serials
-    ]
+    nullifiers = generate_nullifiers(token_serials, sender_private_key, nonce)
     
     return {
         'type': 'token_transfer',
@@ -150,8 +156,21 @@ def generate_token_transfer_proof(
 
 def generate_nullifier(serial_number: str, private_key: str, nonce: str) -> str:
     """Generate nullifier for a token to prevent double-spending"""
-    data = f"NULLIFIER|{serial_number}|{private_key}|{nonce}"
-    return f"NUL-{hashlib.sha256(data.encode()).hexdigest()}"
+    return generate_nullifiers([serial_number], private_key, nonce)[0]
+
+
+def generate_nullifiers(serials: list, private_key: str, nonce: str) -> list:
+    """
+    Generate nullifiers for several tokens spent under one key and nonce
+    The shared key/nonce prefix is hashed once and the hasher copied per serial
+    """
+    base = hashlib.sha256(f"NULLIFIER|{private_key}|{nonce}|".encode())
+    nullifiers = []
+    for serial in serials:
+        h = base.copy()
+        h.update(serial.encode())
+        nullifiers.append(f"NUL-{h.hexdigest()}")
+    return nullifiers
 
 
 def generate_compliance_proof(
@@ -162,7 +181,7 @@ def generate_compliance_proof(
     is_iot: bool = False
 ) -> Dict[str, Any]:
     """Generate ZKP compliance proof"""
-    timestamp = int(time.time() * 1000)
+    timestamp = now_ms()
     nonce = secrets.token_hex(16)
     
     # Check compliance
@@ -199,7 +218,7 @@ def verify_compliance_proof(proof: Dict) -> Dict[str, Any]:
         return {'valid': False, 'error': 'Invalid proof type'}
     
     # Check freshness
-    age = int(time.time() * 1000) - proof.get('timestamp', 0)
+    age = now_ms() - proof.get('timestamp', 0)
     if age > 5 * 60 * 1000:
         return {'valid': False, 'error': 'Proof expired'}
     
@@ -0,0 +1,60 @@
+"""
+Conditional GETs on FI node wallet/subwallet detail routes
+Run from cbdc-token-python/: python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+FI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fi_node')
+sys.path.insert(0, FI_DIR)
+
+import database  # noqa: E402
+from app import app  # noqa: E402
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+class ConditionalGetTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        database.DB_PATH = os.path.join(cls.tmp.name, 'fi.db')
+        # Small test payloads would otherwise fall under the compression threshold
+        app.config['COMPRESS_MIN_SIZE'] = 0
+        cls.client = app.test_client()
+        cls.wallet_id = cls.client.post('/api/wallet/create', json={'name': 'Test'}).get_json()['wallet_id']
+        cls.subwallet_id = cls.client.post(
+            f'/api/wallet/{cls.wallet_id}/device/register', json={'deviceName': 'Watch'}
+        ).get_json()['subwallet_id']
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def assert_not_modified(self, path, headers):
+        first = self.client.get(path, headers=headers)
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers['ETag']
+
+        again = self.client.get(path, headers={**headers, 'If-None-Match': etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.data, b'')
+        return first
+
+    def test_wallet_gzip(self):
+        first = self.assert_not_modified(f'/api/wallet/{self.wallet_id}', GZIP)
+        self.assertEqual(first.headers.get('Content-Encoding'), 'gzip')
+
+    def test_wallet_identity(self):
+        self.assert_not_modified(f'/api/wallet/{self.wallet_id}', {})
+
+    def test_subwallet_gzip(self):
+        first = self.assert_not_modified(f'/api/subwallet/{self.subwallet_id}', GZIP)
+        self.assertEqual(first.headers.get('Content-Encoding'), 'gzip')
+
+
+if __name__ == '__main__':
+    unittest.main()
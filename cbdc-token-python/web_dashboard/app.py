@@ -2,33 +2,225 @@
 Web Dashboard for Token-Based CBDC
 Simple Flask-based dashboard
 """
+import functools
 import os
+import socket
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, request
+from flask_compress import Compress
 from flask_cors import CORS
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+
+from shared.http_utils import json_response
 
 app = Flask(__name__)
-CORS(app)
+# Match /api/x/ and /api/x alike rather than redirecting between them
+app.url_map.strict_slashes = False
+app.url_map.merge_slashes = True
+
+# Let browsers cache preflight results for a day instead of re-sending OPTIONS
+CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
+CORS(app, resources={r"/api/*": {"origins": CORS_ORIGINS}}, max_age=86400, send_wildcard=True)
+
+# Gzip larger JSON bodies (ledger and transaction lists); the SSE stream is
+# text/event-stream and so is never buffered for compression
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_ALGORITHM'] = 'gzip'
+app.config['COMPRESS_MIN_SIZE'] = 512
+Compress(app)
 
 PORT = int(os.environ.get('DASHBOARD_PORT', 3000))
 CB_URL = os.environ.get('CB_URL', 'http://localhost:4000')
 FI1_URL = os.environ.get('FI1_URL', 'http://localhost:4001')
 FI2_URL = os.environ.get('FI2_URL', 'http://localhost:4002')
 
-
-def safe_request(url, method='GET', json_data=None):
-    """Make a safe request with error handling"""
+# Upstream base URL for each /api/<service>/... prefix
+SERVICE_URLS = {'cb': CB_URL, 'fi1': FI1_URL, 'fi2': FI2_URL}
+
+# Upstream URLs built once at import rather than formatted per request
+URLS = {
+    'cb_health': f'{CB_URL}/api/health',
+    'cb_money_supply': f'{CB_URL}/api/money-supply',
+    'cb_fis': f'{CB_URL}/api/fi/list',
+    'cb_mint': f'{CB_URL}/api/token/mint/mixed',
+    'cb_mint_specific': f'{CB_URL}/api/token/mint/specific',
+}
+URL_TEMPLATES = {
+    'cb_ledger': (CB_URL + '/api/ledger?limit=%s').__mod__,
+    'cb_allocate': (CB_URL + '/api/fi/%s/allocate').__mod__,
+}
+for _fi, _base in (('fi1', FI1_URL), ('fi2', FI2_URL)):
+    URLS[f'{_fi}_health'] = f'{_base}/api/health'
+    URLS[f'{_fi}_balance'] = f'{_base}/api/balance'
+    URLS[f'{_fi}_wallets'] = f'{_base}/api/wallet/list'
+    URLS[f'{_fi}_transaction'] = f'{_base}/api/transaction/create'
+    URLS[f'{_fi}_transactions'] = f'{_base}/api/transactions'
+
+# Fixed part of /api/overview (the ledger URL depends on ?limit=)
+OVERVIEW_URLS = {key: URLS[key] for key in (
+    'cb_money_supply', 'fi1_balance', 'fi1_wallets', 'fi2_balance', 'fi2_wallets')}
+
+# Worker threads for fanning one dashboard request out to several upstreams
+EXECUTOR = ThreadPoolExecutor(max_workers=16)
+
+class UpstreamAdapter(HTTPAdapter):
+    """HTTPAdapter whose sockets send small request bodies immediately (no Nagle)
+    and probe idle pooled connections with TCP keepalive"""
+    
+    SOCKET_OPTIONS = [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+
+# One pooled session for all upstream calls so keep-alive sockets are reused.
+# The CB/FI servers speak HTTP/1.1 only, so concurrent calls to one node each
+# need their own connection: keep enough per host for the overview fan-out
+# times the number of requests in flight.
+UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 64))
+SESSION = requests.Session()
+SESSION.headers['Connection'] = 'keep-alive'
+_adapter = UpstreamAdapter(pool_connections=32, pool_maxsize=UPSTREAM_POOL_SIZE, max_retries=0)
+SESSION.mount('http://', _adapter)
+SESSION.mount('https://', _adapter)
+
+
+class _Call:
+    """An upstream GET in progress that identical concurrent requests wait on"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def upstream_get(url):
+    """GET url, sharing one upstream call among concurrent requests for the same URL"""
+    with _inflight_lock:
+        call = _inflight.get(url)
+        leader = call is None
+        if leader:
+            call = _inflight[url] = _Call()
+    
+    if leader:
+        try:
+            call.response = SESSION.get(url, timeout=5)
+        except BaseException as e:
+            # Followers must never come away with a missing response
+            call.error = e
+            raise
+        finally:
+            with _inflight_lock:
+                del _inflight[url]
+            call.done.set()
+        return call.response
+    
+    call.done.wait()
+    if call.error is not None:
+        # Only the leader re-raises the original: a greenlet kill or timeout
+        # bound to the leader must not escape an unrelated request's handler
+        raise requests.ConnectionError(f"shared upstream call failed: {call.error!r}") from call.error
+    return call.response
+
+
+def fetch_json(url, method='GET', json_data=None):
+    """Make a safe request and decode its JSON body
+    Returns (payload, ok); ok is False when the upstream couldn't be reached or
+    sent an unreadable body, and payload is then {'error': ...}. Safe to call
+    from worker threads: the caller decides what a failure means for the request."""
     try:
         if method == 'GET':
-            response = requests.get(url, timeout=5)
+            response = upstream_get(url)
         else:
-            response = requests.post(url, json=json_data, timeout=5)
-        return response.json()
+            response = SESSION.post(url, json=json_data, timeout=5)
+        return orjson.loads(response.content), True
     except Exception as e:
-        return {'error': str(e)}
+        return {'error': str(e)}, False
+
+
+# Pre-serialized bodies for when the upstream node can't be reached or is too slow
+UPSTREAM_ERROR = b'{"error":"upstream unavailable"}'
+UPSTREAM_TIMEOUT = b'{"error":"upstream timeout"}'
+
+
+def safe_passthrough(url, method='GET', json_data=None):
+    """Relay the upstream response bytes as-is instead of decoding and re-encoding them"""
+    try:
+        if method == 'GET':
+            response = upstream_get(url)
+        else:
+            response = SESSION.request(method, url, json=json_data, timeout=5)
+    except requests.Timeout:
+        g.upstream_down = True
+        return Response(UPSTREAM_TIMEOUT, status=504, mimetype='application/json')
+    except requests.RequestException:
+        g.upstream_down = True
+        return Response(UPSTREAM_ERROR, status=502, mimetype='application/json')
+    return Response(response.content, status=response.status_code,
+                    content_type=response.headers.get('Content-Type', 'application/json'))
+
+
+# Recent GET passthrough bodies by path + query. Entries past their TTL are
+# kept as a stale copy to serve while the upstream node is unreachable.
+CACHE_MAX_ENTRIES = 1024
+_response_cache = {}
+_cache_lock = threading.Lock()
+
+
+def cached(ttl, stale=True):
+    """Serve a GET passthrough from memory for ttl seconds
+    (stale=False for health checks, which must report an outage)"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.full_path
+            now = time.monotonic()
+            with _cache_lock:
+                hit = _response_cache.get(key)
+            if hit and hit[0] > now:
+                return Response(hit[1], mimetype='application/json')
+            
+            response = view(*args, **kwargs)
+            if g.get('upstream_down'):
+                if stale and hit:
+                    return Response(hit[1], mimetype='application/json')
+                return response
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            with _cache_lock:
+                if len(_response_cache) >= CACHE_MAX_ENTRIES:
+                    _response_cache.clear()
+                _response_cache[key] = (now + ttl, body)
+            return response
+        return wrapper
+    return decorator
+
+
+@app.after_request
+def expire_cache(response):
+    """A POST may change balances, so expire every cached body (keeping it as stale)"""
+    if request.method == 'POST':
+        with _cache_lock:
+            for key, (_, body) in _response_cache.items():
+                _response_cache[key] = (0, body)
+    return response
 
 
 @app.route('/')
@@ -37,308 +229,257 @@ def index():
     return render_template('index.html')
 
 
+def fetch_overview(limit=10):
+    """Fetch the dashboard summary from CB and both FIs in parallel
+    Returns (overview, ok); ok is False if any upstream call failed."""
+    urls = dict(OVERVIEW_URLS, cb_ledger=URL_TEMPLATES['cb_ledger'](limit))
+    results = list(EXECUTOR.map(fetch_json, urls.values()))
+    return dict(zip(urls, (payload for payload, _ in results))), all(ok for _, ok in results)
+
+
+@app.route('/api/overview')
+@cached(5)
+def overview():
+    """Everything the dashboard refresh needs, fetched from CB and both FIs in parallel"""
+    payload, ok = fetch_overview(request.args.get('limit', 10))
+    if not ok:
+        g.upstream_down = True  # don't cache a partial overview; serve the last good one
+    return json_response(payload)
+
+
+# ========== PUSH UPDATES ==========
+# One poller per process fetches the overview while any /api/stream client
+# is connected, so upstream load doesn't grow with the number of viewers
+
+STREAM_INTERVAL = 2       # Seconds between upstream polls
+STREAM_HEARTBEAT = 15     # Idle seconds before a keep-alive comment
+STREAM_LEDGER_LIMIT = 10
+
+
+class OverviewFeed:
+    """Latest overview plus a condition that wakes subscribers when it changes"""
+    
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.version = 0
+        self.overview = None
+        self.subscribers = 0
+        self.polling = False
+    
+    def _poll(self):
+        while True:
+            overview, _ = fetch_overview(STREAM_LEDGER_LIMIT)
+            with self.cond:
+                if overview != self.overview:
+                    self.overview = overview
+                    self.version += 1
+                    self.cond.notify_all()
+                if not self.subscribers:
+                    self.polling = False
+                    return
+            time.sleep(STREAM_INTERVAL)
+    
+    def subscribe(self):
+        """Yield each new overview, or None after STREAM_HEARTBEAT idle seconds"""
+        with self.cond:
+            self.subscribers += 1
+            if not self.polling:
+                self.polling = True
+                threading.Thread(target=self._poll, daemon=True).start()
+        
+        seen = 0
+        try:
+            while True:
+                with self.cond:
+                    self.cond.wait_for(lambda: self.version != seen, timeout=STREAM_HEARTBEAT)
+                    overview = None
+                    if self.version != seen:
+                        seen, overview = self.version, self.overview
+                yield overview
+        finally:
+            with self.cond:
+                self.subscribers -= 1
+
+
+FEED = OverviewFeed()
+
+
+@app.route('/api/stream')
+def stream():
+    """Server-sent events: the whole overview first, then only the sections that changed"""
+    def generate():
+        sent = {}
+        for overview in FEED.subscribe():
+            if overview is None:
+                yield b': keep-alive\n\n'
+                continue
+            changed = {key: value for key, value in overview.items() if sent.get(key) != value}
+            sent = overview
+            yield b'data: ' + orjson.dumps(changed) + b'\n\n'
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 # ========== CENTRAL BANK APIs ==========
 
 @app.route('/api/cb/health')
+@cached(5, stale=False)
 def cb_health():
-    return jsonify(safe_request(f'{CB_URL}/api/health'))
+    return safe_passthrough(URLS['cb_health'])
 
 
 @app.route('/api/cb/money-supply')
+@cached(5)
 def cb_money_supply():
-    return jsonify(safe_request(f'{CB_URL}/api/money-supply'))
+    return safe_passthrough(URLS['cb_money_supply'])
 
 
 @app.route('/api/cb/ledger')
+@cached(15)
 def cb_ledger():
     limit = request.args.get('limit', 50)
-    return jsonify(safe_request(f'{CB_URL}/api/ledger?limit={limit}'))
+    return safe_passthrough(URL_TEMPLATES['cb_ledger'](limit))
 
 
 @app.route('/api/cb/fis')
+@cached(10)
 def cb_fis():
-    return jsonify(safe_request(f'{CB_URL}/api/fi/list'))
+    return safe_passthrough(URLS['cb_fis'])
 
 
 @app.route('/api/cb/mint', methods=['POST'])
 def cb_mint():
-    data = request.json
-    return jsonify(safe_request(f'{CB_URL}/api/token/mint/mixed', 'POST', data))
+    return safe_passthrough(URLS['cb_mint'], 'POST', request.get_json(silent=True))
 
 
 @app.route('/api/cb/mint/specific', methods=['POST'])
 def cb_mint_specific():
     """Mint specific number of tokens for each denomination"""
-    data = request.json
-    return jsonify(safe_request(f'{CB_URL}/api/token/mint/specific', 'POST', data))
+    return safe_passthrough(URLS['cb_mint_specific'], 'POST', request.get_json(silent=True))
 
 
 @app.route('/api/cb/allocate/<fi_id>', methods=['POST'])
 def cb_allocate(fi_id):
-    data = request.json
-    return jsonify(safe_request(f'{CB_URL}/api/fi/{fi_id}/allocate', 'POST', data))
+    return safe_passthrough(URL_TEMPLATES['cb_allocate'](fi_id), 'POST', request.get_json(silent=True))
 
 
 # ========== FI1 APIs ==========
 
 @app.route('/api/fi1/health')
+@cached(5, stale=False)
 def fi1_health():
-    return jsonify(safe_request(f'{FI1_URL}/api/health'))
+    return safe_passthrough(URLS['fi1_health'])
 
 
 @app.route('/api/fi1/balance')
+@cached(5)
 def fi1_balance():
-    return jsonify(safe_request(f'{FI1_URL}/api/balance'))
+    return safe_passthrough(URLS['fi1_balance'])
 
 
 @app.route('/api/fi1/wallets')
+@cached(10)
 def fi1_wallets():
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/list'))
-
-
-@app.route('/api/fi1/wallet/<wallet_id>')
-def fi1_wallet(wallet_id):
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}'))
-
-
-@app.route('/api/fi1/wallet/create', methods=['POST'])
-def fi1_create_wallet():
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/create', 'POST', data))
-
-
-@app.route('/api/fi1/wallet/<wallet_id>/allocate', methods=['POST'])
-def fi1_allocate_wallet(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}/allocate', 'POST', data))
-
-
-@app.route('/api/fi1/wallet/<wallet_id>/subwallets')
-def fi1_subwallets(wallet_id):
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}/subwallets'))
-
-
-@app.route('/api/fi1/wallet/<wallet_id>/device', methods=['POST'])
-def fi1_register_device(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}/device/register', 'POST', data))
-
-
-@app.route('/api/fi1/wallet/<wallet_id>/device/register', methods=['POST'])
-def fi1_register_device_alt(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}/device/register', 'POST', data))
-
-
-@app.route('/api/fi1/wallet/<wallet_id>/subwallet/<subwallet_id>/se/load', methods=['POST'])
-def fi1_se_load(wallet_id, subwallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}/subwallet/{subwallet_id}/se/load', 'POST', data))
-
-
-@app.route('/api/fi1/subwallet/<subwallet_id>/se/balance')
-def fi1_se_balance(subwallet_id):
-    return jsonify(safe_request(f'{FI1_URL}/api/subwallet/{subwallet_id}/se/balance'))
-
-
-@app.route('/api/fi1/subwallet/<subwallet_id>/offline/transaction', methods=['POST'])
-def fi1_offline_tx(subwallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/subwallet/{subwallet_id}/offline/transaction', 'POST', data))
-
-
-@app.route('/api/fi1/subwallet/<subwallet_id>/status', methods=['POST'])
-def fi1_device_status(subwallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/subwallet/{subwallet_id}/status', 'POST', data))
-
-
-@app.route('/api/fi1/subwallet/<subwallet_id>/sync', methods=['POST'])
-def fi1_sync(subwallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/subwallet/{subwallet_id}/sync', 'POST', data))
-
-
-@app.route('/api/fi1/subwallet/<subwallet_id>')
-def fi1_subwallet_detail(subwallet_id):
-    return jsonify(safe_request(f'{FI1_URL}/api/subwallet/{subwallet_id}'))
-
-
-# FI1 Wallet SE Routes (for wallet-to-wallet offline with ZKP)
-@app.route('/api/fi1/wallet/<wallet_id>/details')
-def fi1_wallet_details(wallet_id):
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}/details'))
-
-
-@app.route('/api/fi1/wallet/<wallet_id>/se/load', methods=['POST'])
-def fi1_wallet_se_load(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}/se/load', 'POST', data))
-
-
-@app.route('/api/fi1/wallet/<wallet_id>/se/balance')
-def fi1_wallet_se_balance(wallet_id):
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}/se/balance'))
-
-
-@app.route('/api/fi1/wallet/<wallet_id>/offline/transaction', methods=['POST'])
-def fi1_wallet_offline_tx(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}/offline/transaction', 'POST', data))
-
-
-@app.route('/api/fi1/wallet/<wallet_id>/status', methods=['POST'])
-def fi1_wallet_status(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}/status', 'POST', data))
-
-
-@app.route('/api/fi1/wallet/<wallet_id>/sync', methods=['POST'])
-def fi1_wallet_sync(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/wallet/{wallet_id}/sync', 'POST', data))
+    return safe_passthrough(URLS['fi1_wallets'])
 
 
 @app.route('/api/fi1/transaction', methods=['POST'])
 def fi1_transaction():
-    data = request.json
-    return jsonify(safe_request(f'{FI1_URL}/api/transaction/create', 'POST', data))
+    return safe_passthrough(URLS['fi1_transaction'], 'POST', request.get_json(silent=True))
 
 
 @app.route('/api/fi1/transactions')
+@cached(10)
 def fi1_transactions():
-    return jsonify(safe_request(f'{FI1_URL}/api/transactions'))
+    return safe_passthrough(URLS['fi1_transactions'])
 
 
 # ========== FI2 APIs ==========
 
 @app.route('/api/fi2/health')
+@cached(5, stale=False)
 def fi2_health():
-    return jsonify(safe_request(f'{FI2_URL}/api/health'))
+    return safe_passthrough(URLS['fi2_health'])
 
 
 @app.route('/api/fi2/balance')
+@cached(5)
 def fi2_balance():
-    return jsonify(safe_request(f'{FI2_URL}/api/balance'))
+    return safe_passthrough(URLS['fi2_balance'])
 
 
 @app.route('/api/fi2/wallets')
+@cached(10)
 def fi2_wallets():
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/list'))
-
-
-@app.route('/api/fi2/wallet/<wallet_id>')
-def fi2_wallet(wallet_id):
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}'))
-
-
-@app.route('/api/fi2/wallet/create', methods=['POST'])
-def fi2_create_wallet():
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/create', 'POST', data))
-
-
-@app.route('/api/fi2/wallet/<wallet_id>/allocate', methods=['POST'])
-def fi2_allocate_wallet(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}/allocate', 'POST', data))
-
-
-@app.route('/api/fi2/wallet/<wallet_id>/subwallets')
-def fi2_subwallets(wallet_id):
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}/subwallets'))
-
-
-@app.route('/api/fi2/wallet/<wallet_id>/device', methods=['POST'])
-def fi2_register_device(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}/device/register', 'POST', data))
-
-
-@app.route('/api/fi2/wallet/<wallet_id>/device/register', methods=['POST'])
-def fi2_register_device_alt(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}/device/register', 'POST', data))
-
-
-@app.route('/api/fi2/wallet/<wallet_id>/subwallet/<subwallet_id>/se/load', methods=['POST'])
-def fi2_se_load(wallet_id, subwallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}/subwallet/{subwallet_id}/se/load', 'POST', data))
-
-
-@app.route('/api/fi2/subwallet/<subwallet_id>/se/balance')
-def fi2_se_balance(subwallet_id):
-    return jsonify(safe_request(f'{FI2_URL}/api/subwallet/{subwallet_id}/se/balance'))
-
-
-@app.route('/api/fi2/subwallet/<subwallet_id>/offline/transaction', methods=['POST'])
-def fi2_offline_tx(subwallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/subwallet/{subwallet_id}/offline/transaction', 'POST', data))
-
-
-@app.route('/api/fi2/subwallet/<subwallet_id>/status', methods=['POST'])
-def fi2_device_status(subwallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/subwallet/{subwallet_id}/status', 'POST', data))
-
-
-@app.route('/api/fi2/subwallet/<subwallet_id>/sync', methods=['POST'])
-def fi2_sync(subwallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/subwallet/{subwallet_id}/sync', 'POST', data))
-
-
-@app.route('/api/fi2/subwallet/<subwallet_id>')
-def fi2_subwallet_detail(subwallet_id):
-    return jsonify(safe_request(f'{FI2_URL}/api/subwallet/{subwallet_id}'))
-
-
-# FI2 Wallet SE Routes (for wallet-to-wallet offline with ZKP)
-@app.route('/api/fi2/wallet/<wallet_id>/details')
-def fi2_wallet_details(wallet_id):
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}/details'))
-
-
-@app.route('/api/fi2/wallet/<wallet_id>/se/load', methods=['POST'])
-def fi2_wallet_se_load(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}/se/load', 'POST', data))
-
-
-@app.route('/api/fi2/wallet/<wallet_id>/se/balance')
-def fi2_wallet_se_balance(wallet_id):
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}/se/balance'))
-
-
-@app.route('/api/fi2/wallet/<wallet_id>/offline/transaction', methods=['POST'])
-def fi2_wallet_offline_tx(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}/offline/transaction', 'POST', data))
-
-
-@app.route('/api/fi2/wallet/<wallet_id>/status', methods=['POST'])
-def fi2_wallet_status(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}/status', 'POST', data))
-
-
-@app.route('/api/fi2/wallet/<wallet_id>/sync', methods=['POST'])
-def fi2_wallet_sync(wallet_id):
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/wallet/{wallet_id}/sync', 'POST', data))
+    return safe_passthrough(URLS['fi2_wallets'])
 
 
 @app.route('/api/fi2/transaction', methods=['POST'])
 def fi2_transaction():
-    data = request.json
-    return jsonify(safe_request(f'{FI2_URL}/api/transaction/create', 'POST', data))
+    return safe_passthrough(URLS['fi2_transaction'], 'POST', request.get_json(silent=True))
 
 
 @app.route('/api/fi2/transactions')
+@cached(10)
 def fi2_transactions():
-    return jsonify(safe_request(f'{FI2_URL}/api/transactions'))
+    return safe_passthrough(URLS['fi2_transactions'])
+
+
+# ========== BATCHED DEVICE STATUS ==========
+
+STATUS_WORKERS = 16       # Upstream status calls in flight per batch
+STATUS_MAX_IDS = 256      # Largest batch one request may ask for
+
+# Own pool so a big batch never queues behind (or starves) the overview fan-out
+STATUS_EXECUTOR = ThreadPoolExecutor(max_workers=STATUS_WORKERS)
+
+
+@app.route('/api/<service>/subwallets/status', methods=['POST'])
+def batch_subwallet_status(service):
+    """Set online status for many subwallets at once
+    Body: {"ids": [...], "isOnline": bool, "payloads": {id: {...}}} -> {id: result}"""
+    if service not in ('fi1', 'fi2'):
+        return json_response({'error': f'Unknown FI {service}'}, 404)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return json_response({'error': 'JSON object body is required'}, 400)
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not all(isinstance(i, str) and i for i in ids):
+        return json_response({'error': 'ids must be a list of subwallet id strings'}, 400)
+    if len(ids) > STATUS_MAX_IDS:
+        return json_response({'error': f'At most {STATUS_MAX_IDS} ids per request'}, 400)
+    payloads = data.get('payloads') or {}
+    if not isinstance(payloads, dict):
+        return json_response({'error': 'payloads must be an object keyed by id'}, 400)
+    
+    base = SERVICE_URLS[service]
+    shared = {'isOnline': data.get('isOnline', True)}
+    
+    def set_status(subwallet_id):
+        url = f"{base}/api/subwallet/{quote(subwallet_id, safe='')}/status"
+        return fetch_json(url, 'POST', payloads.get(subwallet_id, shared))[0]
+    
+    results = {}
+    for start in range(0, len(ids), STATUS_WORKERS):
+        batch = ids[start:start + STATUS_WORKERS]
+        results.update(zip(batch, STATUS_EXECUTOR.map(set_status, batch)))
+    return json_response(results)
+
+
+# ========== PASSTHROUGH ==========
+# Routes whose upstream path is the same after the service prefix
+# (e.g. /api/fi1/wallet/<id>/se/load -> FI1 /api/wallet/<id>/se/load)
+
+@app.route('/api/<service>/<path:rest>', methods=['GET', 'POST'])
+def passthrough(service, rest):
+    base = SERVICE_URLS.get(service)
+    if base is None:
+        return json_response({'error': f'Unknown service {service}'}, 404)
+    url = f'{base}/api/{rest}'
+    if request.query_string:
+        url += '?' + request.query_string.decode()
+    return safe_passthrough(url, request.method, request.get_json(silent=True))
 
 
 if __name__ == '__main__':
@@ -346,4 +487,5 @@ if __name__ == '__main__':
     print(f"   Central Bank: {CB_URL}")
     print(f"   FI1: {FI1_URL}")
     print(f"   FI2: {FI2_URL}")
-    app.run(host='0.0.0.0', port=PORT, debug=True)
+    debug = os.environ.get('FLASK_DEBUG', '0') == '1'
+    app.run(host='0.0.0.0', port=PORT, debug=debug, threaded=True)
@@ -0,0 +1,19 @@
+"""
+Web Dashboard WSGI entrypoint
+Every dashboard route waits on a CB/FI node, so the app runs on gevent:
+the patched sockets let one process keep many proxy calls in flight.
+Run it with gevent workers: each /api/stream (SSE) client holds its
+connection open, which would pin a whole thread under gthread.
+Usage (from web_dashboard/):
+    gunicorn -c ../gunicorn_conf.py -k gevent -w 4 -b 0.0.0.0:3000 wsgi:application
+    python wsgi.py    # single process, no gunicorn
+"""
+from gevent import monkey
+monkey.patch_all()
+
+from app import app as application, PORT
+
+if __name__ == '__main__':
+    from gevent.pywsgi import WSGIServer
+    print(f"🌐 Token CBDC Dashboard (gevent) starting on port {PORT}")
+    WSGIServer(('0.0.0.0', PORT), application).serve_forever()